@@ -1,14 +1,133 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
 from tinygrad.tensor import Tensor
-from tinygrad import dtypes
+from tinygrad import Device, dtypes, TinyJit
+from tinygrad.helpers import GlobalCounters
+from aes256 import metrics
+from aes256.trace import Recorder
 from aes256.constants import (
     Sbox as Sbox_const,
     InvSbox as InvSbox_const,
     Rcon as Rcon_const,
 )
 
-Sbox = Tensor(Sbox_const, dtype=dtypes.uint8)
-InvSbox = Tensor(InvSbox_const, dtype=dtypes.uint8)
-Rcon = Tensor(Rcon_const, dtype=dtypes.uint8)
+# bytes in one expanded AES-128 key schedule (11 round keys of 16 bytes)
+SCHEDULE_SIZE = 176
+KEY_BITS = 128
+
+# one captured TinyJit per (direction, state shape, round key shape, device)
+_kernels: dict[tuple, TinyJit] = {}
+
+# device bytes per block of a pass: (direction, device, per-lane keys) -> (lanes measured at, bytes),
+# taken from the largest captured kernel and assumed until one is captured
+_footprint: dict[tuple[str, str, bool], tuple[int, int]] = {}
+DEFAULT_BYTES_PER_BLOCK = 64
+# with per-lane keys, each lane also carries up to two sets of 11 round keys
+DEFAULT_LANE_KEY_BYTES = 2 * SCHEDULE_SIZE
+
+# device memory for one pass; larger inputs are split into chunks that fit
+DEFAULT_MEMORY_BUDGET = 256 << 20
+
+# high-water mark of TinyGrad's allocated device memory, sampled after every pass
+_peak_memory = 0
+
+# device for engines built without an explicit one; None follows TinyGrad's Device.DEFAULT
+_default_device: str | None = None
+
+# S-box and inverse S-box per canonical device name, uploaded once
+_tables: dict[str, tuple[Tensor, Tensor]] = {}
+
+# TinyGrad is not thread-safe (its kernel cache is a sqlite connection bound to
+# the thread that opened it), so every realize runs on one device thread
+_device_local = threading.local()
+_device = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="aes256-device", initializer=lambda: setattr(_device_local, "active", True)
+)
+
+
+def on_device(fn, *args):
+    """Call ``fn`` on the device thread, from any thread, and return its result."""
+    if getattr(_device_local, "active", False):
+        return fn(*args)
+    return _device.submit(fn, *args).result()
+
+
+def _submit(fn, *args) -> Future:
+    """Queue ``fn`` on the device thread without waiting for it."""
+    if getattr(_device_local, "active", False):
+        future: Future = Future()
+        future.set_result(fn(*args))
+        return future
+    return _device.submit(fn, *args)
+
+
+def set_default_device(device: str | None):
+    """Place engines built without ``device=`` on ``device`` (e.g. "LLVM", "CPU", "PYTHON").
+
+    ``None`` restores TinyGrad's own default. Existing engines keep their device.
+    """
+    global _default_device
+    _default_device = None if device is None else Device.canonicalize(device)
+
+
+def default_device() -> str:
+    return Device.canonicalize(_default_device)
+
+
+def tables(device: str | None = None) -> tuple[Tensor, Tensor]:
+    """The S-box and inverse S-box tensors on ``device``, copied there on first use."""
+    device = Device.canonicalize(device or _default_device)
+    if device not in _tables:
+        metrics.inc("aes256_cache_total", cache="tables", result="miss")
+        _tables[device] = on_device(
+            lambda: tuple(Tensor(t, dtype=dtypes.uint8, device=device).realize() for t in (Sbox_const, InvSbox_const))
+        )
+    return _tables[device]
+
+
+def memory_per_block(direction: str = "encrypt", device: str | None = None, lane_keys: bool = False) -> int:
+    """Estimated device bytes per block of one ``direction`` pass on ``device``.
+
+    Measured from the buffers of the largest kernel captured so far, which
+    hold the input, output and intermediate states, plus the round keys when
+    every lane has its own (``lane_keys``). Until the first capture the
+    estimate is ``DEFAULT_BYTES_PER_BLOCK``, plus ``DEFAULT_LANE_KEY_BYTES``
+    with per-lane keys.
+    """
+    key = (direction, Device.canonicalize(device or _default_device), lane_keys)
+    lanes, nbytes = _footprint.get(key, (1, 0))
+    return -(-nbytes // lanes) or DEFAULT_BYTES_PER_BLOCK + lane_keys * DEFAULT_LANE_KEY_BYTES
+
+
+def _record_footprint(key: tuple[str, str, bool], lanes: int, jit: TinyJit):
+    if jit.captured is None or _footprint.get(key, (0,))[0] >= lanes:
+        return
+    buffers = {id(b): b for item in jit.captured.jit_cache for b in item.bufs if b is not None}
+    _footprint[key] = (lanes, sum(b.nbytes for b in buffers.values()))
+
+
+def peak_memory() -> int:
+    """Highest TinyGrad device allocation seen after any pass, in bytes."""
+    return _peak_memory
+
+
+def reset_peak_memory():
+    global _peak_memory
+    _peak_memory = GlobalCounters.mem_used
+
+
+def __getattr__(name: str):
+    # the module-level tables are kept for existing imports, on the default device
+    if name in ("Sbox", "InvSbox"):
+        return tables()[name == "InvSbox"]
+    if name == "Rcon":
+        return Tensor(Rcon_const, dtype=dtypes.uint8, device=default_device())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def xtime(a: Tensor) -> Tensor:
     shifted = a.lshift(1)
@@ -28,111 +147,463 @@ def matrix2text(matrix: Tensor) -> int:
     return result
 
 
-class AES:
-    def __init__(self, master_key):
-        self.change_key(master_key)
+def blocks2bytes(blocks: list[int], lanes: int | None = None) -> bytes:
+    """Serialize 128-bit blocks big-endian, zero-padding to ``lanes`` blocks."""
+    lanes = len(blocks) if lanes is None else lanes
+    return b"".join(block.to_bytes(16, "big") for block in blocks) + bytes(16 * (lanes - len(blocks)))
 
-    def change_key(self, master_key):
-        self.round_keys = Tensor.zeros((44, 4), dtype=dtypes.uint8).contiguous()
-        self.round_keys[:4] = text2matrix(master_key)
-        for i in range(4, 4 * 11):
-            if i % 4 == 0:
-                self.round_keys[i, 0] = (
-                    self.round_keys[i - 4, 0]
-                    ^ Sbox[self.round_keys[i - 1, 1].item()]
-                    ^ Rcon[i // 4].item()
-                )
-
-                shifted_indices = Tensor([2, 3, 0], dtype=dtypes.uint8)
-                sboxed = Sbox[self.round_keys[i - 1][shifted_indices]]
-                self.round_keys[i, 1:] = self.round_keys[i - 4, 1:].xor(sboxed)
-            else:
-                self.round_keys[i] = self.round_keys[i - 4].xor(self.round_keys[i - 1])
-
-    def encrypt(self, plaintext: int) -> int:
-        self.plain_state = text2matrix(plaintext)
-        self.__add_round_key(self.plain_state, self.round_keys[:4])
 
-        for i in range(1, 10):
-            self.__round_encrypt(
-                self.plain_state, self.round_keys[4 * i : 4 * (i + 1)]
-            )
+def bytes2blocks(data: bytes, count: int | None = None) -> list[int]:
+    """Parse the first ``count`` big-endian 128-bit blocks out of ``data``."""
+    count = len(data) // 16 if count is None else count
+    return [int.from_bytes(data[16 * i : 16 * (i + 1)], "big") for i in range(count)]
+
+
+def blocks2state(blocks: list[int], lanes: int | None = None) -> Tensor:
+    """Pack 128-bit blocks into a (lanes, 4, 4) state, zero-padding the tail."""
+    return Tensor(blocks2bytes(blocks, lanes), dtype=dtypes.uint8).reshape((-1, 4, 4))
+
+
+def state2blocks(state: Tensor, count: int | None = None) -> list[int]:
+    """Unpack the first ``count`` lanes of a (lanes, 4, 4) state into integers."""
+    return bytes2blocks(bytes(state.data()), count)
+
+
+def expand_key(master_key: int) -> bytes:
+    """FIPS-197 KeyExpansion of a 128-bit key into its 176-byte schedule."""
+    metrics.inc("aes256_key_expansions_total", key_bits=KEY_BITS)
+    w = list(master_key.to_bytes(16, "big"))
+    for i in range(4, 4 * 11):
+        t = w[4 * (i - 1) : 4 * i]
+        if i % 4 == 0:
+            t = [Sbox_const[t[1]] ^ Rcon_const[i // 4], Sbox_const[t[2]], Sbox_const[t[3]], Sbox_const[t[0]]]
+        w.extend(a ^ b for a, b in zip(w[4 * (i - 4) : 4 * (i - 3)], t))
+    return bytes(w)
+
+
+def _xtime(a: int) -> int:
+    return ((a << 1) ^ 0x1B) & 0xFF if a & 0x80 else a << 1
+
+
+def _inv_mix_word(w: bytes) -> bytes:
+    # InvMixColumns as a pre-multiplication of MixColumns, as in __inv_mix_columns
+    u = _xtime(_xtime(w[0] ^ w[2]))
+    v = _xtime(_xtime(w[1] ^ w[3]))
+    a = (w[0] ^ u, w[1] ^ v, w[2] ^ u, w[3] ^ v)
+    t = a[0] ^ a[1] ^ a[2] ^ a[3]
+    return bytes(a[j] ^ t ^ _xtime(a[j] ^ a[(j + 1) % 4]) for j in range(4))
+
+
+def decryption_schedule(schedule: bytes) -> bytes:
+    """Round keys for the FIPS-197 equivalent inverse cipher, in the order it uses them.
+
+    The schedule is reversed and InvMixColumns is applied to the nine inner
+    round keys, so decryption rounds have the same shape as encryption rounds.
+    """
+    out = []
+    for o in range(0, len(schedule), SCHEDULE_SIZE):
+        keys = [schedule[o + 16 * r : o + 16 * (r + 1)] for r in range(10, -1, -1)]
+        out.append(keys[0])
+        out.extend(b"".join(_inv_mix_word(k[4 * c : 4 * (c + 1)]) for c in range(4)) for k in keys[1:10])
+        out.append(keys[10])
+    return b"".join(out)
+
 
-        self.__sub_bytes(self.plain_state)
-        self.__shift_rows(self.plain_state)
-        self.__add_round_key(self.plain_state, self.round_keys[40:])
+def bucket(n: int) -> int:
+    """Round a batch size up to a power of two so batches share compiled kernels."""
+    return 1 << max(n - 1, 0).bit_length()
 
-        return matrix2text(self.plain_state)
 
-    def decrypt(self, ciphertext: int) -> int:
-        self.cipher_state = text2matrix(ciphertext)
-        self.__add_round_key(self.cipher_state, self.round_keys[40:])
-        self.__inv_shift_rows(self.cipher_state)
-        self.__inv_sub_bytes(self.cipher_state)
-        for i in range(9, 0, -1):
-            self.__round_decrypt(
-                self.cipher_state, self.round_keys[4 * i : 4 * (i + 1)]
-            )
+def _lane_round_keys(schedule: bytes, lanes: int, device: str) -> tuple[Tensor, ...]:
+    """Split ``lanes`` concatenated schedules into 11 per-round (lanes, 4, 4) tensors on ``device``."""
+    shape = (4, 4) if lanes == 1 else (lanes, 4, 4)
+    return tuple(
+        Tensor(
+            b"".join(schedule[o + 16 * r : o + 16 * (r + 1)] for o in range(0, len(schedule), SCHEDULE_SIZE)),
+            dtype=dtypes.uint8,
+            device=device,
+        ).reshape(shape).realize()
+        for r in range(11)
+    )
 
-        self.__add_round_key(self.cipher_state, self.round_keys[:4])
 
-        return matrix2text(self.cipher_state)
+class RoundKeys:
+    """Expanded key schedules uploaded to the device once and never mutated.
 
-    def __round_encrypt(self, state_matrix: Tensor, key_matrix: Tensor) -> Tensor:
-        self.__sub_bytes(state_matrix)
-        self.__shift_rows(state_matrix)
-        self.__mix_columns(state_matrix)
-        self.__add_round_key(state_matrix, key_matrix)
+    Instances are safe to share between threads and engines; ``change_key``
+    swaps in a new object rather than editing this one. Each direction's
+    round keys are uploaded on first use, so encrypt-only engines never pay
+    for ``decryption_schedule``, and chunked per-lane passes upload only the
+    lanes of each chunk (``lane_slice``).
+    """
 
+    __slots__ = ("schedule", "lanes", "device", "_encrypt", "_decrypt")
 
-    def __round_decrypt(self, state_matrix: Tensor, key_matrix: Tensor) -> Tensor:
-        self.__add_round_key(state_matrix, key_matrix)
-        self.__inv_mix_columns(state_matrix)
-        self.__inv_shift_rows(state_matrix)
-        self.__inv_sub_bytes(state_matrix)
+    def __init__(self, schedule: bytes, device: str | None = None):
+        if not schedule or len(schedule) % SCHEDULE_SIZE:
+            raise ValueError(f"schedule must be a multiple of {SCHEDULE_SIZE} bytes")
+        lanes = len(schedule) // SCHEDULE_SIZE
+        if lanes > 1:
+            # per-lane keys are padded to the same bucket as the blocks they pair with
+            schedule = schedule + bytes(SCHEDULE_SIZE * (bucket(lanes) - lanes))
+        object.__setattr__(self, "schedule", bytes(schedule))
+        object.__setattr__(self, "lanes", lanes)
+        object.__setattr__(self, "device", Device.canonicalize(device or _default_device))
+        object.__setattr__(self, "_encrypt", None)
+        object.__setattr__(self, "_decrypt", None)
+
+    # racing threads may both upload a direction's keys; either result is the same
+
+    @property
+    def encrypt(self) -> tuple[Tensor, ...]:
+        if self._encrypt is None:
+            object.__setattr__(self, "_encrypt", self.__upload(self.schedule, bucket(self.lanes)))
+        return self._encrypt
+
+    @property
+    def decrypt(self) -> tuple[Tensor, ...]:
+        if self._decrypt is None:
+            object.__setattr__(self, "_decrypt", self.__upload(decryption_schedule(self.schedule), bucket(self.lanes)))
+        return self._decrypt
+
+    def lane_slice(self, direction: str, start: int, lanes: int) -> tuple[Tensor, ...]:
+        """``direction`` round keys of lanes ``start`` to ``start + lanes`` only, uploaded afresh."""
+        schedule = self.schedule[start * SCHEDULE_SIZE : (start + lanes) * SCHEDULE_SIZE]
+        return self.__upload(schedule if direction == "encrypt" else decryption_schedule(schedule), lanes)
+
+    def __upload(self, schedule: bytes, lanes: int) -> tuple[Tensor, ...]:
+        start = time.perf_counter()
+        keys = on_device(_lane_round_keys, schedule, lanes, self.device)
+        metrics.observe("aes256_seconds", time.perf_counter() - start, op="key_setup")
+        return keys
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RoundKeys is immutable")
+
+
+class AES:
+    # device bytes one pass may use; None means DEFAULT_MEMORY_BUDGET
+    memory_budget: int | None = None
+
+    def __init__(self, master_key, device: str | None = None, memory_budget: int | None = None):
+        """``device`` picks the TinyGrad device for this engine, else the package default.
+
+        Batches needing more than ``memory_budget`` bytes of device memory are
+        split into chunks that fit, see ``chunk_blocks``.
+        """
+        self.keys = RoundKeys(expand_key(master_key), device)
+        self.memory_budget = memory_budget
+
+    @classmethod
+    def from_schedule(cls, schedule: bytes, device: str | None = None) -> "AES":
+        """Build an engine from expanded key schedules.
+
+        ``schedule`` holds one or more concatenated 176-byte schedules. With
+        more than one, lane ``i`` of every batch is keyed by schedule ``i``, so
+        ``encrypt_blocks`` takes exactly one block per schedule.
+        """
+        return cls.from_round_keys(RoundKeys(schedule, device))
+
+    @classmethod
+    def from_round_keys(cls, keys: RoundKeys) -> "AES":
+        """Build an engine over an existing, possibly shared, ``RoundKeys``."""
+        aes = cls.__new__(cls)
+        aes.keys = keys
+        return aes
+
+    def change_key(self, master_key):
+        self.keys = RoundKeys(expand_key(master_key), self.keys.device)
+
+    @property
+    def lanes(self) -> int:
+        return self.keys.lanes
+
+    @property
+    def device(self) -> str:
+        return self.keys.device
+
+    def chunk_blocks(self, direction: str = "encrypt") -> int:
+        """Blocks per pass under the memory budget, a power of two so chunks share one kernel."""
+        budget = DEFAULT_MEMORY_BUDGET if self.memory_budget is None else self.memory_budget
+        fit = budget // memory_per_block(direction, self.device, self.lanes > 1)
+        return 1 << max(fit.bit_length() - 1, 0)
+
+    @property
+    def round_keys(self) -> Tensor:
+        shape = (44, 4) if self.keys.lanes == 1 else (-1, 44, 4)
+        return Tensor(self.keys.schedule, dtype=dtypes.uint8, device=self.device).reshape(shape)
+
+    @property
+    def decrypt_round_keys(self) -> Tensor:
+        """Equivalent-inverse-cipher round keys, in the order decryption applies them."""
+        shape = (44, 4) if self.keys.lanes == 1 else (-1, 44, 4)
+        return Tensor(decryption_schedule(self.keys.schedule), dtype=dtypes.uint8, device=self.device).reshape(shape)
+
+    def encrypt(self, plaintext: int, trace: list | None = None) -> int:
+        return self.encrypt_blocks([plaintext], trace)[0]
+
+    def decrypt(self, ciphertext: int, trace: list | None = None) -> int:
+        return self.decrypt_blocks([ciphertext], trace)[0]
+
+    def encrypt_blocks(self, blocks: list[int], trace: list | None = None, lane: int = 0) -> list[int]:
+        """Encrypt a batch of 128-bit blocks in a single pass.
+
+        Passing a ``trace`` list records the state of block ``lane`` after every
+        step in FIPS-197 Appendix C layout (see ``aes256.trace``). Traced calls
+        run eagerly instead of through the captured kernels.
+        """
+        return self.__run(self.__cipher, "encrypt", blocks, self.__recorder(trace, blocks, lane))
+
+    def decrypt_blocks(self, blocks: list[int], trace: list | None = None, lane: int = 0) -> list[int]:
+        """Decrypt a batch of 128-bit blocks in a single pass, optionally traced."""
+        return self.__run(self.__inv_cipher, "decrypt", blocks, self.__recorder(trace, blocks, lane, inverse=True))
+
+    def crypt_blocks(self, blocks: list[int], decrypt: list[bool], trace: list | None = None, lane: int = 0) -> list[int]:
+        """Encrypt or decrypt each block in one pass, decrypting ``blocks[i]`` where ``decrypt[i]`` is set.
+
+        Both directions share the round structure of the equivalent inverse
+        cipher, so every lane runs the same kernel and picks its S-box, row
+        shift, key and InvMixColumns pre-step from the mask. A mixed queue
+        stays one batch instead of two smaller ones.
+        """
+        if len(decrypt) != len(blocks):
+            raise ValueError(f"expected one direction per block, got {len(decrypt)} for {len(blocks)} blocks")
+        inverse = trace is not None and 0 <= lane < len(decrypt) and bool(decrypt[lane])
+        note = self.__recorder(trace, blocks, lane, inverse)
+        keys = ((self.keys, "encrypt"), (self.keys, "decrypt"))
+        return self.__run(self.__mixed_cipher, "mixed", blocks, note, decrypt, keys)
+
+    def reencrypt_blocks(self, blocks: list[int], target: "AES") -> list[int]:
+        """Decrypt under this engine's key and encrypt under ``target``'s, fused in one pass.
+
+        The intermediate plaintext only ever exists on the device.
+        """
+        self.__check_target(target)
+        keys = ((self.keys, "decrypt"), (target.keys, "encrypt"))
+        return self.__run(self.__recipher, "reencrypt", blocks, key_sets=keys)
+
+    def keystream_delta(self, counters: list[int], target: "AES") -> list[int]:
+        """``E(c) ^ E_target(c)`` for each counter block, in one pass.
+
+        XORed into CTR ciphertext it swaps this key's keystream for ``target``'s
+        without ever forming the plaintext.
+        """
+        self.__check_target(target)
+        if target.keys is self.keys:
+            # the keystreams cancel, and the JIT rejects the same tensors passed twice
+            if self.lanes > 1 and len(counters) != self.lanes:
+                raise ValueError(f"expected {self.lanes} blocks, one per key schedule, got {len(counters)}")
+            return [0] * len(counters)
+        keys = ((self.keys, "encrypt"), (target.keys, "encrypt"))
+        return self.__run(self.__keystream_delta, "rekey", counters, key_sets=keys)
+
+    def __recorder(self, trace: list | None, blocks: list[int], lane: int, inverse: bool = False) -> Recorder | None:
+        if trace is None:
+            return None
+        if not 0 <= lane < len(blocks):
+            raise ValueError(f"lane {lane} out of range for {len(blocks)} blocks")
+        return Recorder(trace, lane, inverse)
+
+    def __check_target(self, target: "AES"):
+        if target.device != self.device or target.lanes != self.lanes:
+            raise ValueError("both engines must share a device and lane count")
+
+    def __run(
+        self,
+        cipher,
+        direction: str,
+        blocks: list[int],
+        note: Recorder | None = None,
+        mask: list[bool] | None = None,
+        key_sets: tuple[tuple[RoundKeys, str], ...] | None = None,
+    ) -> list[int]:
+        """Run ``cipher`` over the concatenated round keys of ``key_sets``, (keys, direction) pairs."""
+        lanes = self.keys.lanes
+        if lanes > 1 and len(blocks) != lanes:
+            raise ValueError(f"expected {lanes} blocks, one per key schedule, got {len(blocks)}")
+        if not blocks:
+            return []
+        start = time.perf_counter()
+        key_sets = ((self.keys, direction),) if key_sets is None else key_sets
+        # traced passes cannot be split, everything else is chunked to the budget
+        chunk = len(blocks) if note is not None else self.chunk_blocks(direction)
+        if chunk < len(blocks) and lanes > 1:
+            # per-lane keys are uploaded chunk by chunk, never for the whole batch
+            round_keys = partial(self.__lane_keys, key_sets)
+        else:
+            round_keys = partial(self.__shared_keys, key_sets)
+        # packing and unpacking stay on the calling thread, only the passes themselves are serialized;
+        # the next chunk is packed while the previous one is on the device
+        out: list[int] = []
+        pending: deque = deque()
+        for i in range(0, len(blocks), chunk):
+            part = blocks[i : i + chunk]
+            data = blocks2bytes(part, bucket(len(part)))
+            flags = None if mask is None else bytes(map(bool, mask[i : i + chunk])).ljust(bucket(len(part)), b"\0")
+            keys = partial(round_keys, i, bucket(len(part)))
+            pending.append((_submit(self.__launch, cipher, direction, keys, data, note, flags), len(part)))
+            metrics.observe("aes256_batch_blocks", len(part), direction=direction)
+            if len(pending) > 1:
+                future, count = pending.popleft()
+                out += bytes2blocks(future.result(), count)
+        for future, count in pending:
+            out += bytes2blocks(future.result(), count)
+        mode = metrics.current_mode()
+        metrics.inc("aes256_blocks_total", len(out), mode=mode, direction=direction, key_bits=KEY_BITS)
+        metrics.inc("aes256_bytes_total", 16 * len(out), mode=mode, direction=direction, key_bits=KEY_BITS)
+        metrics.observe("aes256_seconds", time.perf_counter() - start, op=direction)
+        return out
+
+    def __shared_keys(self, key_sets: tuple, start: int, lanes: int) -> tuple[Tensor, ...]:
+        return sum((getattr(keys, direction) for keys, direction in key_sets), ())
+
+    def __lane_keys(self, key_sets: tuple, start: int, lanes: int) -> tuple[Tensor, ...]:
+        return sum((keys.lane_slice(direction, start, lanes) for keys, direction in key_sets), ())
+
+    def __launch(self, cipher, direction: str, round_keys, data: bytes, note: Recorder | None, mask: bytes | None) -> bytes:
+        """One pass on the device thread; ``round_keys()`` yields the key tensors for this chunk."""
+        global _peak_memory
+        keys = round_keys()
+        state = Tensor(data, dtype=dtypes.uint8, device=keys[0].device).reshape((-1, 4, 4))
+        tables(state.device)  # upload outside any kernel capture
+        if mask is not None:
+            # the lane mask travels as the first key tensor, so it is a kernel input like the keys
+            keys = (Tensor(mask, dtype=dtypes.uint8, device=state.device).reshape((-1, 1, 1)).realize(), *keys)
+        if note is not None:
+            out = cipher(state, keys, note)
+        else:
+            sig = (direction, state.shape, keys[-1].shape, state.device)
+            metrics.inc("aes256_cache_total", cache="kernels", result="hit" if sig in _kernels else "miss")
+            if sig not in _kernels:
+                _kernels[sig] = TinyJit(lambda s, *k: cipher(s, k).realize())
+            out = _kernels[sig](state, *keys)
+            _record_footprint((direction, state.device, keys[-1].ndim == 3), state.shape[0], _kernels[sig])
+        _peak_memory = max(_peak_memory, GlobalCounters.mem_used)
+        return bytes(out.data())
+
+    def __note(self, note: Recorder | None, step: str, t: Tensor):
+        if note is not None:
+            # realize in place so later steps build on this state, not the whole chain
+            t.realize()
+            note(step, state2blocks(t[note.lane] if t.ndim == 3 else t)[0])
+
+    def __cipher(self, state: Tensor, keys: tuple[Tensor, ...], note: Recorder | None = None) -> Tensor:
+        self.__note(note, "input", state)
+        self.__note(note, "k_sch", keys[0])
+        state = self.__add_round_key(state, keys[0])
+
+        for i in range(1, 10):
+            state = self.__round_encrypt(state, keys[i], note)
+
+        self.__note(note, "start", state)
+        state = self.__sub_bytes(state)
+        self.__note(note, "s_box", state)
+        state = self.__shift_rows(state)
+        self.__note(note, "s_row", state)
+        self.__note(note, "k_sch", keys[10])
+        state = self.__add_round_key(state, keys[10])
+        self.__note(note, "output", state)
+        return state
+
+    def __inv_cipher(self, state: Tensor, keys: tuple[Tensor, ...], note: Recorder | None = None) -> Tensor:
+        # equivalent inverse cipher: keys come from decryption_schedule
+        self.__note(note, "input", state)
+        self.__note(note, "k_sch", keys[0])
+        state = self.__add_round_key(state, keys[0])
+
+        for i in range(1, 10):
+            state = self.__round_decrypt(state, keys[i], note)
+
+        self.__note(note, "start", state)
+        state = self.__inv_sub_bytes(state)
+        self.__note(note, "s_box", state)
+        state = self.__inv_shift_rows(state)
+        self.__note(note, "s_row", state)
+        self.__note(note, "k_sch", keys[10])
+        state = self.__add_round_key(state, keys[10])
+        self.__note(note, "output", state)
+        return state
+
+    def __mixed_cipher(self, state: Tensor, keys: tuple[Tensor, ...], note: Recorder | None = None) -> Tensor:
+        # keys are the lane mask (nonzero to decrypt), then 11 encryption and 11 decryption round keys
+        decrypt = keys[0] != 0
+        keys = tuple(decrypt.where(d, e) for e, d in zip(keys[1:12], keys[12:]))
+        self.__note(note, "input", state)
+        self.__note(note, "k_sch", keys[0])
+        state = self.__add_round_key(state, keys[0])
+
+        for i in range(1, 11):
+            self.__note(note, "start", state)
+            state = decrypt.where(self.__inv_sub_bytes(state), self.__sub_bytes(state))
+            self.__note(note, "s_box", state)
+            state = decrypt.where(self.__inv_shift_rows(state), self.__shift_rows(state))
+            self.__note(note, "s_row", state)
+            if i < 10:
+                state = self.__mix_columns(decrypt.where(self.__inv_mix_prefix(state), state))
+                self.__note(note, "m_col", state)
+            self.__note(note, "k_sch", keys[i])
+            state = self.__add_round_key(state, keys[i])
+        self.__note(note, "output", state)
+        return state
+
+    def __recipher(self, state: Tensor, keys: tuple[Tensor, ...]) -> Tensor:
+        # keys are the old key's decryption round keys, then the new key's encryption round keys
+        return self.__cipher(self.__inv_cipher(state, keys[:11]), keys[11:])
+
+    def __keystream_delta(self, state: Tensor, keys: tuple[Tensor, ...]) -> Tensor:
+        return self.__cipher(state, keys[:11]).xor(self.__cipher(state, keys[11:]))
+
+    def __round_encrypt(self, state_matrix: Tensor, key_matrix: Tensor, note: Recorder | None = None) -> Tensor:
+        self.__note(note, "start", state_matrix)
+        state_matrix = self.__sub_bytes(state_matrix)
+        self.__note(note, "s_box", state_matrix)
+        state_matrix = self.__shift_rows(state_matrix)
+        self.__note(note, "s_row", state_matrix)
+        state_matrix = self.__mix_columns(state_matrix)
+        self.__note(note, "m_col", state_matrix)
+        self.__note(note, "k_sch", key_matrix)
+        return self.__add_round_key(state_matrix, key_matrix)
+
+    def __round_decrypt(self, state_matrix: Tensor, key_matrix: Tensor, note: Recorder | None = None) -> Tensor:
+        self.__note(note, "start", state_matrix)
+        state_matrix = self.__inv_sub_bytes(state_matrix)
+        self.__note(note, "s_box", state_matrix)
+        state_matrix = self.__inv_shift_rows(state_matrix)
+        self.__note(note, "s_row", state_matrix)
+        state_matrix = self.__inv_mix_columns(state_matrix)
+        self.__note(note, "m_col", state_matrix)
+        self.__note(note, "k_sch", key_matrix)
+        return self.__add_round_key(state_matrix, key_matrix)
+
+    # state tensors are (..., 4, 4): one row per column word, so a FIPS-197
+    # state row is the last axis index and leading axes are batch lanes
 
     def __add_round_key(self, s: Tensor, k: Tensor) -> Tensor:
-        s.assign(s.xor(k))
+        return s.xor(k)
 
     def __sub_bytes(self, s: Tensor) -> Tensor:
-        s.assign(Sbox[s])
+        return tables(s.device)[0][s]
 
     def __inv_sub_bytes(self, s: Tensor) -> Tensor:
-        s.assign(InvSbox[s])
+        return tables(s.device)[1][s]
 
     def __shift_rows(self, s: Tensor) -> Tensor:
-        _s = s
-        for i in range(1, 4):
-            _s[:, i] = _s[:, i].roll(-i, dims=0)
-
-        s.assign(_s)
-
+        return Tensor.stack(*[s[..., :, i].roll(-i, dims=-1) for i in range(4)], dim=-1)
 
     def __inv_shift_rows(self, s: Tensor) -> Tensor:
-        _s = s
-        for i in range(1, 4):
-            _s[:, i] = _s[:, i].roll(i, dims=0)
-
-        s.assign(_s)
+        return Tensor.stack(*[s[..., :, i].roll(i, dims=-1) for i in range(4)], dim=-1)
 
     def __mix_columns(self, s: Tensor) -> Tensor:
-        t = s[:, 0].xor(s[:, 1]).xor(s[:, 2]).xor(s[:, 3])
-        xtimes = xtime(s.roll(-1, dims=1).xor(s)).contiguous()
-        s.assign(s.xor(t.unsqueeze(1)).xor(xtimes))
+        t = s[..., :, 0].xor(s[..., :, 1]).xor(s[..., :, 2]).xor(s[..., :, 3])
+        xtimes = xtime(s.roll(-1, dims=-1).xor(s))
+        return s.xor(t.unsqueeze(-1)).xor(xtimes)
 
+    def __inv_mix_prefix(self, s: Tensor) -> Tensor:
+        # byte j of each column picks up xtime^2(s[j] ^ s[j + 2]); MixColumns of that is InvMixColumns
+        return s.xor(xtime(xtime(s.xor(s.roll(2, dims=-1)))))
 
     def __inv_mix_columns(self, s: Tensor) -> Tensor:
-        u = xtime(xtime(s[:, 0].xor(s[:, 2])))
-        v = xtime(xtime(s[:, 1].xor(s[:, 3])))
-
-        _s = s.clone()
-        _s[:, 0] = s[:, 0].xor(u)
-        _s[:, 1] = s[:, 1].xor(v)
-        _s[:, 2] = s[:, 2].xor(u)
-        _s[:, 3] = s[:, 3].xor(v)
-
-        self.__mix_columns(_s)
-        s.assign(_s)
+        return self.__mix_columns(self.__inv_mix_prefix(s))
 
 if __name__ == "__main__":
     aes = AES(0x2B7E151628AED2A6ABF7158809CF4F3C)
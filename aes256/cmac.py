@@ -0,0 +1,69 @@
+"""AES-CMAC (RFC 4493) over many messages at once.
+
+CMAC is a CBC chain and so serial within one message, but independent across
+messages. ``cmac_many`` orders messages by block count and advances every
+message still in progress by one block per step, so a step is a single
+batched ``AES.encrypt_blocks`` call and the number of cipher calls is the
+length of the longest message, not the number of messages.
+"""
+
+from functools import lru_cache
+
+from aes256 import metrics
+from aes256.aes import AES
+
+BLOCK_SIZE = 16
+_MASK = (1 << 128) - 1
+
+
+def _double(block: int) -> int:
+    """Multiply by x in GF(2^128), the RFC 4493 subkey step."""
+    shifted = (block << 1) & _MASK
+    return shifted ^ 0x87 if block >> 127 else shifted
+
+
+@lru_cache(maxsize=256)
+def subkeys(key: int) -> tuple[AES, int, int]:
+    """The engine and subkeys K1, K2 for ``key``, derived once and cached."""
+    aes = AES(key)
+    k1 = _double(aes.encrypt(0))
+    return aes, k1, _double(k1)
+
+
+def _blocks(message: bytes, k1: int, k2: int) -> list[int]:
+    """Split a message into blocks with the last one padded and masked."""
+    n = max(1, -(-len(message) // BLOCK_SIZE))
+    blocks = [int.from_bytes(message[BLOCK_SIZE * i : BLOCK_SIZE * (i + 1)], "big") for i in range(n - 1)]
+    last = bytes(message[BLOCK_SIZE * (n - 1) :])
+    if len(last) == BLOCK_SIZE:
+        blocks.append(int.from_bytes(last, "big") ^ k1)
+    else:
+        padded = last + b"\x80" + bytes(BLOCK_SIZE - 1 - len(last))
+        blocks.append(int.from_bytes(padded, "big") ^ k2)
+    return blocks
+
+
+@metrics.mode("cmac")
+def cmac_many(key: int, messages: list[bytes]) -> list[bytes]:
+    """16-byte CMAC tags of ``messages`` under ``key``, in input order."""
+    aes, k1, k2 = subkeys(key)
+    blocks = [_blocks(message, k1, k2) for message in messages]
+    # longest first, so the messages still running at any step are a prefix
+    order = sorted(range(len(messages)), key=lambda i: len(blocks[i]), reverse=True)
+    chains = [blocks[i] for i in order]
+    state = [0] * len(chains)
+    active = len(chains)
+    for step in range(len(chains[0]) if chains else 0):
+        while len(chains[active - 1]) <= step:
+            active -= 1
+        state[:active] = aes.encrypt_blocks([s ^ chain[step] for s, chain in zip(state, chains[:active])])
+
+    tags = [b""] * len(messages)
+    for i, tag in zip(order, state):
+        tags[i] = tag.to_bytes(BLOCK_SIZE, "big")
+    return tags
+
+
+def cmac(key: int, message: bytes) -> bytes:
+    """16-byte CMAC tag of a single message."""
+    return cmac_many(key, [message])[0]
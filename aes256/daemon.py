@@ -0,0 +1,287 @@
+"""Local encryption daemon over a Unix domain socket.
+
+One process holds warmed-up engines and serves every client on the host, so
+clients skip TinyGrad's start-up and kernel compiles entirely. Requests and
+responses use a fixed binary framing::
+
+    request   op u8 | reserved 3 bytes | key id u32 | count u32 | count * 16 bytes
+    response  status u8 | reserved 3 bytes | count u32 | count * 16 bytes
+              (on error, count is the length of a UTF-8 message instead)
+
+Keys are registered with the daemon by id and never cross the socket.
+Requests from all connections are queued and drained into one batched
+cipher pass per (key, direction), so many small concurrent requests cost a
+few large passes. ``Client`` keeps a pool of connections, one request in
+flight per connection.
+
+Run with ``python -m aes256.daemon --socket /run/aes256.sock --key-file keys``,
+where ``keys`` holds one ``id:hex`` line per key and is readable by its owner
+only, so keys never show up in ``ps`` or ``/proc/<pid>/cmdline``.
+"""
+
+import argparse
+import os
+import queue
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+from concurrent.futures import Future
+
+from aes256.aes import AES, bytes2blocks, blocks2bytes
+
+REQUEST = struct.Struct(">B3xII")
+RESPONSE = struct.Struct(">B3xI")
+OP_ENCRYPT = 1
+OP_DECRYPT = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+# largest request accepted, in blocks
+MAX_BLOCKS = 1 << 20
+# blocks per pass when draining the queue
+MAX_BATCH = 1 << 16
+
+_DIRECTIONS = {OP_ENCRYPT: "encrypt", OP_DECRYPT: "decrypt"}
+
+
+class DaemonError(RuntimeError):
+    """Raised by ``Client`` when the daemon rejects a request."""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    """Read exactly ``size`` bytes, or None if the peer closed first."""
+    buf = bytearray(size)
+    view, got = memoryview(buf), 0
+    while got < size:
+        n = sock.recv_into(view[got:])
+        if not n:
+            return None
+        got += n
+    return bytes(buf)
+
+
+def load_keys(path: str) -> dict[int, int]:
+    """Key id -> master key from ``id:hex`` lines in ``path``, or stdin for "-".
+
+    Blank lines and ``#`` comments are skipped. A key file that group or
+    other users can access is refused.
+    """
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path) as f:
+            if os.fstat(f.fileno()).st_mode & 0o077:
+                raise PermissionError(f"key file {path} must only be accessible to its owner (chmod 600)")
+            text = f.read()
+    lines = (line.strip() for line in text.splitlines())
+    return {int(key_id): int(key, 16) for key_id, key in (line.split(":", 1) for line in lines if line and line[0] != "#")}
+
+
+class Batcher:
+    """Drains queued requests into one cipher pass per key and direction."""
+
+    def __init__(self, engines: dict[int, AES], linger: float = 0.0005, max_batch: int = MAX_BATCH):
+        self.engines = engines
+        self.linger = linger
+        self.max_batch = max_batch
+        self.passes = 0
+        self.pending: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="aes256-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, key_id: int, direction: str, blocks: list[int]) -> Future:
+        future: Future = Future()
+        if key_id not in self.engines:
+            future.set_exception(ValueError(f"unknown key id {key_id}"))
+        else:
+            self.pending.put((key_id, direction, blocks, future))
+        return future
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+
+    def run(self):
+        while (item := self.pending.get()) is not None:
+            items, size = [item], len(item[2])
+            try:
+                while size < self.max_batch:
+                    item = self.pending.get(timeout=self.linger) if self.linger else self.pending.get_nowait()
+                    if item is None:
+                        self.pending.put(None)
+                        break
+                    items.append(item)
+                    size += len(item[2])
+            except queue.Empty:
+                pass
+            groups: dict[tuple[int, str], list] = {}
+            for key_id, direction, blocks, future in items:
+                groups.setdefault((key_id, direction), []).append((blocks, future))
+            for (key_id, direction), group in groups.items():
+                self.__pass(self.engines[key_id], direction, group)
+
+    def __pass(self, aes: AES, direction: str, group: list):
+        blocks = [b for request, _ in group for b in request]
+        try:
+            out = getattr(aes, f"{direction}_blocks")(blocks)
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+            return
+        self.passes += 1
+        offset = 0
+        for request, future in group:
+            future.set_result(out[offset : offset + len(request)])
+            offset += len(request)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher: Batcher = self.server.batcher
+        while (header := _recv_exact(self.request, REQUEST.size)) is not None:
+            op, key_id, count = REQUEST.unpack(header)
+            if op not in _DIRECTIONS or count > MAX_BLOCKS:
+                # the payload length cannot be trusted, so the connection is dropped
+                self.__error(f"bad request: op {op}, {count} blocks")
+                return
+            data = _recv_exact(self.request, 16 * count)
+            if data is None:
+                return
+            try:
+                out = batcher.submit(key_id, _DIRECTIONS[op], bytes2blocks(data)).result()
+            except Exception as e:
+                self.__error(str(e))
+                continue
+            self.request.sendall(RESPONSE.pack(STATUS_OK, len(out)) + blocks2bytes(out))
+
+    def __error(self, message: str):
+        raw = message.encode()
+        self.request.sendall(RESPONSE.pack(STATUS_ERROR, len(raw)) + raw)
+
+
+class Daemon(socketserver.ThreadingUnixStreamServer):
+    """Serves ``keys`` (key id -> 128-bit master key) on the socket at ``path``.
+
+    ``warm`` lists batch sizes whose kernels are compiled before serving.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        path: str,
+        keys: dict[int, int],
+        warm: tuple[int, ...] = (1, 64, 4096),
+        linger: float = 0.0005,
+        max_batch: int = MAX_BATCH,
+    ):
+        try:
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            # a socket left behind by a previous daemon
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        engines = {key_id: AES(key) for key_id, key in keys.items()}
+        # kernels depend on the batch shape only, so warming one engine warms them all
+        for aes in list(engines.values())[:1]:
+            for size in warm:
+                aes.decrypt_blocks(aes.encrypt_blocks([0] * size))
+        super().__init__(path, _Handler)
+        self.path = path
+        self.batcher = Batcher(engines, linger, max_batch)
+
+    def start(self) -> threading.Thread:
+        """Serve on a background thread."""
+        thread = threading.Thread(target=self.serve_forever, name="aes256-daemon", daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class Client:
+    """Talks to a ``Daemon``, reusing up to ``pool_size`` idle connections."""
+
+    def __init__(self, path: str, pool_size: int = 8):
+        self.path = path
+        self.pool: queue.LifoQueue = queue.LifoQueue(pool_size)
+        self.connections = 0
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def encrypt_blocks(self, key_id: int, blocks: list[int]) -> list[int]:
+        return self.__call(OP_ENCRYPT, key_id, blocks)
+
+    def decrypt_blocks(self, key_id: int, blocks: list[int]) -> list[int]:
+        return self.__call(OP_DECRYPT, key_id, blocks)
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __connect(self) -> socket.socket:
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self.connections += 1
+            return sock
+
+    def __call(self, op: int, key_id: int, blocks: list[int]) -> list[int]:
+        if len(blocks) > MAX_BLOCKS:
+            raise ValueError(f"at most {MAX_BLOCKS} blocks per request")
+        sock = self.__connect()
+        try:
+            sock.sendall(REQUEST.pack(op, key_id, len(blocks)) + blocks2bytes(blocks))
+            header = _recv_exact(sock, RESPONSE.size)
+            if header is None:
+                raise ConnectionError("daemon closed the connection")
+            status, count = RESPONSE.unpack(header)
+            payload = _recv_exact(sock, count if status != STATUS_OK else 16 * count)
+            if payload is None:
+                raise ConnectionError("daemon closed the connection")
+        except BaseException:
+            sock.close()
+            raise
+        try:
+            self.pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+        if status != STATUS_OK:
+            raise DaemonError(payload.decode())
+        return bytes2blocks(payload)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Serve AES engines on a Unix domain socket.")
+    parser.add_argument("--socket", required=True, help="socket path")
+    parser.add_argument(
+        "--key-file", required=True, metavar="PATH", help="ID:HEX lines, one 128-bit key each, mode 600; - reads stdin"
+    )
+    parser.add_argument("--linger", type=float, default=0.0005, help="seconds to wait for more requests per pass")
+    args = parser.parse_args(argv)
+    try:
+        keys = load_keys(args.key_file)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    with Daemon(args.socket, keys, linger=args.linger) as daemon:
+        daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Versioned container format for large encrypted records.
+
+A record is a fixed header followed by independently authenticated chunks::
+
+    header   magic "AESR" | version u8 | mode u8 | reserved u16
+             | key id u32 | chunk size u32 | nonce 12 bytes        (28 bytes)
+    chunk i  ciphertext (chunk size bytes, the last may be shorter)
+             | tag 16 bytes
+
+Chunks are encrypted with AES-CTR, counter block ``nonce || u32 block index``
+counted across the whole record, and tagged with HMAC-SHA256 (truncated to
+16 bytes) over the header, the chunk index, a final-chunk flag and the
+ciphertext. Encryption and MAC keys are derived from the master key, so one
+key can seal many records as long as nonces never repeat.
+
+Every chunk sits at a fixed offset and verifies on its own, so records can be
+sealed and opened on a thread pool, read a chunk at a time, or abandoned
+early. The final-chunk flag makes truncation at a chunk boundary detectable.
+Pool threads overlap the MAC and packing work; the cipher passes themselves
+run one at a time on ``aes256.aes``'s device thread. Process pools are
+rejected, as TinyGrad cannot be used from a forked child.
+"""
+
+import hashlib
+import hmac
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterator, NamedTuple
+
+from aes256 import metrics
+from aes256.aes import AES
+
+MAGIC = b"AESR"
+VERSION = 1
+MODE_CTR_HMAC_SHA256 = 1
+
+HEADER = struct.Struct(">4sBBHII12s")
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# chunks passed to the cipher per batched call
+CHUNKS_PER_BATCH = 16
+
+
+class FramingError(ValueError):
+    """Raised when a record is malformed or a chunk fails authentication."""
+
+
+class Header(NamedTuple):
+    key_id: int
+    mode: int
+    chunk_size: int
+    nonce: bytes
+
+    def pack(self) -> bytes:
+        return HEADER.pack(MAGIC, VERSION, self.mode, 0, self.key_id, self.chunk_size, self.nonce)
+
+
+@lru_cache(maxsize=64)
+def derive_keys(key: int) -> tuple[AES, bytes]:
+    """The CTR engine and MAC key for a master key, derived by encrypting constants."""
+    master = AES(key)
+    enc, *mac = master.encrypt_blocks([1, 2, 3])
+    return AES(enc), b"".join(block.to_bytes(16, "big") for block in mac)
+
+
+def read_header(record) -> Header:
+    view = memoryview(record)
+    if len(view) < HEADER.size:
+        raise FramingError("record is shorter than its header")
+    magic, version, mode, _, key_id, chunk_size, nonce = HEADER.unpack(view[: HEADER.size])
+    if magic != MAGIC:
+        raise FramingError("not an encrypted record")
+    if version != VERSION:
+        raise FramingError(f"unsupported record version {version}")
+    if mode != MODE_CTR_HMAC_SHA256:
+        raise FramingError(f"unsupported record mode {mode}")
+    if not chunk_size or chunk_size % 16:
+        raise FramingError(f"invalid chunk size {chunk_size}")
+    return Header(key_id, mode, chunk_size, nonce)
+
+
+def chunk_count(record) -> int:
+    """Number of chunks in a record, from its length alone."""
+    header = read_header(record)
+    body = len(record) - HEADER.size
+    count = -(-body // (header.chunk_size + TAG_SIZE))
+    if count == 0 or body - (count - 1) * (header.chunk_size + TAG_SIZE) < TAG_SIZE:
+        raise FramingError("record is truncated")
+    return count
+
+
+def _tag(mac_key: bytes, header: bytes, index: int, final: bool, ciphertext) -> bytes:
+    mac = hmac.new(mac_key, header, hashlib.sha256)
+    mac.update(struct.pack(">QB", index, final))
+    mac.update(ciphertext)
+    return mac.digest()[:TAG_SIZE]
+
+
+@metrics.mode("ctr")
+def _ctr_xor(aes: AES, header: Header, first: int, chunks: list) -> list[bytes]:
+    """XOR chunks ``first, first + 1, ...`` with their keystream in one batched call."""
+    prefix = int.from_bytes(header.nonce, "big") << 32
+    per_chunk = header.chunk_size // 16
+    counters = []
+    for i, chunk in enumerate(chunks):
+        start = (first + i) * per_chunk
+        counters.extend(prefix | (start + j) for j in range(-(-len(chunk) // 16)))
+    stream = b"".join(block.to_bytes(16, "big") for block in aes.encrypt_blocks(counters))
+
+    out, offset = [], 0
+    for i, chunk in enumerate(chunks):
+        n = len(chunk)
+        pad = int.from_bytes(stream[offset : offset + n], "big")
+        out.append((int.from_bytes(chunk, "big") ^ pad).to_bytes(n, "big"))
+        offset += -(-n // 16) * 16
+    return out
+
+
+def _seal(key: int, header: bytes, first: int, count: int, chunks: list) -> list[bytes]:
+    aes, mac_key = derive_keys(key)
+    info = read_header(header)
+    sealed = []
+    for i, ciphertext in enumerate(_ctr_xor(aes, info, first, chunks)):
+        tag = _tag(mac_key, header, first + i, first + i == count - 1, ciphertext)
+        sealed.append(ciphertext + tag)
+    return sealed
+
+
+def _open(key: int, header: bytes, first: int, count: int, chunks: list) -> list[bytes]:
+    aes, mac_key = derive_keys(key)
+    ciphertexts = []
+    for i, chunk in enumerate(chunks):
+        ciphertext, tag = chunk[:-TAG_SIZE], chunk[-TAG_SIZE:]
+        if not hmac.compare_digest(_tag(mac_key, header, first + i, first + i == count - 1, ciphertext), tag):
+            raise FramingError(f"chunk {first + i} failed authentication")
+        ciphertexts.append(ciphertext)
+    return _ctr_xor(aes, read_header(header), first, ciphertexts)
+
+
+def _groups(executor: ThreadPoolExecutor | None, fn, key: int, header: bytes, count: int, chunks: list):
+    """Run ``fn`` over consecutive batches of chunks, serially or on ``executor``."""
+    if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+        raise TypeError("executor must be a ThreadPoolExecutor; TinyGrad cannot run in forked processes")
+    starts = range(0, count, CHUNKS_PER_BATCH)
+    batches = [chunks[s : s + CHUNKS_PER_BATCH] for s in starts]
+    n = len(batches)
+    return (map if executor is None else executor.map)(fn, [key] * n, [header] * n, starts, [count] * n, batches)
+
+
+def encode(
+    key: int,
+    data,
+    key_id: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    nonce: bytes | None = None,
+    executor: ThreadPoolExecutor | None = None,
+) -> bytearray:
+    """Seal ``data`` (any bytes-like object) into a record under ``key``.
+
+    Chunks are sliced from ``data`` without copying and encrypted
+    ``CHUNKS_PER_BATCH`` at a time, on ``executor`` when one is given.
+    """
+    if not chunk_size or chunk_size % 16 or chunk_size >= 2**32:
+        raise ValueError("chunk_size must be a positive multiple of 16 below 2**32")
+    if nonce is not None and len(nonce) != 12:
+        raise ValueError("nonce must be 12 bytes")
+    view = memoryview(data).cast("B")
+    count = max(1, -(-len(view) // chunk_size))
+    if count * (chunk_size // 16) > 2**32:
+        raise ValueError("record is too large for a 32-bit block counter")
+
+    header = Header(key_id, MODE_CTR_HMAC_SHA256, chunk_size, os.urandom(12) if nonce is None else nonce).pack()
+    chunks = [view[i * chunk_size : (i + 1) * chunk_size] for i in range(count)]
+    record = bytearray(HEADER.size + len(view) + count * TAG_SIZE)
+    record[: HEADER.size] = header
+    offset = HEADER.size
+    for sealed in _groups(executor, _seal, key, header, count, chunks):
+        for chunk in sealed:
+            record[offset : offset + len(chunk)] = chunk
+            offset += len(chunk)
+    return record
+
+
+def _chunks(record, header: Header, count: int) -> list:
+    view = memoryview(record).cast("B")
+    stride = header.chunk_size + TAG_SIZE
+    return [view[HEADER.size + i * stride : HEADER.size + (i + 1) * stride] for i in range(count)]
+
+
+def decode(key: int, record, executor: ThreadPoolExecutor | None = None) -> bytearray:
+    """Verify and decrypt a whole record, raising ``FramingError`` on any bad chunk."""
+    header, count = read_header(record), chunk_count(record)
+    chunks = _chunks(record, header, count)
+    plaintext = bytearray(len(record) - HEADER.size - count * TAG_SIZE)
+    offset = 0
+    for opened in _groups(executor, _open, key, bytes(record[: HEADER.size]), count, chunks):
+        for chunk in opened:
+            plaintext[offset : offset + len(chunk)] = chunk
+            offset += len(chunk)
+    return plaintext
+
+
+def iter_decode(key: int, record) -> Iterator[bytes]:
+    """Yield verified plaintext chunk by chunk, so readers can stop early."""
+    header, count = read_header(record), chunk_count(record)
+    chunks = _chunks(record, header, count)
+    raw = bytes(record[: HEADER.size])
+    for first in range(0, count, CHUNKS_PER_BATCH):
+        yield from _open(key, raw, first, count, chunks[first : first + CHUNKS_PER_BATCH])
+
+
+def decode_chunk(key: int, record, index: int) -> bytes:
+    """Verify and decrypt the single chunk at ``index``."""
+    header, count = read_header(record), chunk_count(record)
+    if not 0 <= index < count:
+        raise IndexError(f"chunk {index} out of range for {count} chunks")
+    stride = header.chunk_size + TAG_SIZE
+    view = memoryview(record).cast("B")[HEADER.size + index * stride : HEADER.size + (index + 1) * stride]
+    return _open(key, bytes(record[: HEADER.size]), index, count, [view])[0]
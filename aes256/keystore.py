@@ -0,0 +1,84 @@
+"""Compact storage for large numbers of expanded keys.
+
+An ``AES`` engine keeps its round keys as device tensors, which is the
+right trade-off for a few hot keys but far too heavy for a million resident
+tenant keys. ``KeyStore`` keeps every 176-byte schedule in one contiguous
+``bytearray`` with a key-id index, and hands out ``KeyHandle`` objects (two
+slots) that point into it. Batched engines are built straight from the
+store: ``engine(key_ids)`` gathers the schedules for one lane per key id.
+"""
+
+from typing import Hashable, Iterable
+
+from aes256.aes import AES, SCHEDULE_SIZE, expand_key
+
+
+class KeyHandle:
+    """A reference to one schedule inside a ``KeyStore``."""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: "KeyStore", index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def schedule(self) -> memoryview:
+        return self.store.schedule(self.index)
+
+    def engine(self, device: str | None = None) -> AES:
+        """A single-key engine for this schedule, uploaded on demand."""
+        return AES.from_schedule(bytes(self.schedule), device)
+
+
+class KeyStore:
+    def __init__(self, keys: Iterable[tuple[Hashable, int]] = ()):
+        self.schedules = bytearray()
+        self.index: dict[Hashable, int] = {}
+        for key_id, master_key in keys:
+            self.add(key_id, master_key)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key_id: Hashable) -> bool:
+        return key_id in self.index
+
+    def __getitem__(self, key_id: Hashable) -> KeyHandle:
+        return KeyHandle(self, self.index[key_id])
+
+    def add(self, key_id: Hashable, master_key: int) -> KeyHandle:
+        """Expand and store ``master_key``, replacing any key already under ``key_id``."""
+        schedule = expand_key(master_key)
+        i = self.index.get(key_id)
+        if i is None:
+            i = self.index[key_id] = len(self.schedules) // SCHEDULE_SIZE
+            self.schedules += schedule
+        else:
+            self.schedules[i * SCHEDULE_SIZE : (i + 1) * SCHEDULE_SIZE] = schedule
+        return KeyHandle(self, i)
+
+    def schedule(self, index: int) -> memoryview:
+        return memoryview(self.schedules)[index * SCHEDULE_SIZE : (index + 1) * SCHEDULE_SIZE]
+
+    def gather(self, key_ids: Iterable[Hashable]) -> bytes:
+        """Concatenated schedules for ``key_ids``, in order, as ``AES.from_schedule`` takes them."""
+        view = memoryview(self.schedules)
+        return b"".join(view[i * SCHEDULE_SIZE : (i + 1) * SCHEDULE_SIZE] for i in map(self.index.__getitem__, key_ids))
+
+    def engine(self, key_ids: list[Hashable], device: str | None = None) -> AES:
+        """A batched engine whose lane ``i`` is keyed by ``key_ids[i]``."""
+        return AES.from_schedule(self.gather(key_ids), device)
+
+    def encrypt_blocks(self, key_ids: list[Hashable], blocks: list[int]) -> list[int]:
+        """Encrypt ``blocks[i]`` under the key stored as ``key_ids[i]``, in one pass."""
+        return self.__engine(key_ids, blocks).encrypt_blocks(blocks)
+
+    def decrypt_blocks(self, key_ids: list[Hashable], blocks: list[int]) -> list[int]:
+        return self.__engine(key_ids, blocks).decrypt_blocks(blocks)
+
+    def __engine(self, key_ids: list[Hashable], blocks: list[int]) -> AES:
+        # a single id builds a shared-key engine, which would accept any number of blocks
+        if len(key_ids) != len(blocks):
+            raise ValueError(f"expected one key id per block, got {len(key_ids)} for {len(blocks)} blocks")
+        return self.engine(key_ids)
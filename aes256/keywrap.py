@@ -0,0 +1,151 @@
+"""AES key wrap (RFC 3394) and key wrap with padding (RFC 5649) in bulk.
+
+Wrapping ``n`` 64-bit blocks takes ``6 * n`` dependent cipher calls, but
+different keys are independent. ``wrap_many``/``unwrap_many`` order the
+items by length and advance all unfinished items by one step per batched
+cipher call, so wrapping thousands of data keys costs ``6 * n`` calls in
+total rather than per key.
+
+Unwrapping reports failures per item: a key that fails its integrity check
+(wrong KEK, corrupted or truncated input) comes back as ``None`` while the
+rest of the batch is returned normally.
+"""
+
+from functools import lru_cache
+
+from aes256 import metrics
+from aes256.aes import AES
+
+IV = 0xA6A6A6A6A6A6A6A6
+# RFC 5649 alternative initial value, followed by the 32-bit message length
+AIV_PREFIX = 0xA65959A6
+_MASK64 = (1 << 64) - 1
+
+
+class KeyWrapError(ValueError):
+    """Raised when a single wrapped key fails to unwrap."""
+
+
+@lru_cache(maxsize=64)
+def _engine(kek: int) -> AES:
+    return AES(kek)
+
+
+def _semiblocks(data: bytes) -> list[int]:
+    return [int.from_bytes(data[i : i + 8], "big") for i in range(0, len(data), 8)]
+
+
+def _join(a: int, r: list[int]) -> bytes:
+    return b"".join(x.to_bytes(8, "big") for x in [a, *r])
+
+
+def _wrap(aes: AES, ivs: list[int], items: list[list[int]]) -> list[bytes]:
+    """RFC 3394 wrapping process, with every item stepping in lockstep."""
+    order = sorted(range(len(items)), key=lambda k: len(items[k]), reverse=True)
+    a = [ivs[k] for k in order]
+    r = [list(items[k]) for k in order]
+    active = len(r)
+    for step in range(6 * len(r[0]) if r else 0):
+        while 6 * len(r[active - 1]) <= step:
+            active -= 1
+        out = aes.encrypt_blocks([(a[k] << 64) | r[k][step % len(r[k])] for k in range(active)])
+        for k, b in enumerate(out):
+            n = len(r[k])
+            a[k] = (b >> 64) ^ (step + 1)  # t = n * j + i with step = n * j + (i - 1)
+            r[k][step % n] = b & _MASK64
+
+    wrapped = [b""] * len(items)
+    for k, i in enumerate(order):
+        wrapped[i] = _join(a[k], r[k])
+    return wrapped
+
+
+def _unwrap(aes: AES, items: list[list[int]]) -> list[tuple[int, list[int]]]:
+    """RFC 3394 unwrapping process in lockstep; returns each item's (A, R)."""
+    order = sorted(range(len(items)), key=lambda k: len(items[k]), reverse=True)
+    a = [items[k][0] for k in order]
+    r = [list(items[k][1:]) for k in order]
+    active = len(r)
+    for step in range(6 * len(r[0]) if r else 0):
+        while 6 * len(r[active - 1]) <= step:
+            active -= 1
+        t = [6 * len(r[k]) - step for k in range(active)]
+        out = aes.decrypt_blocks([((a[k] ^ t[k]) << 64) | r[k][(t[k] - 1) % len(r[k])] for k in range(active)])
+        for k, b in enumerate(out):
+            a[k] = b >> 64
+            r[k][(t[k] - 1) % len(r[k])] = b & _MASK64
+
+    unwrapped = [(0, [])] * len(items)
+    for k, i in enumerate(order):
+        unwrapped[i] = (a[k], r[k])
+    return unwrapped
+
+
+@metrics.mode("keywrap")
+def wrap_many(kek: int, keys: list[bytes], pad: bool = False) -> list[bytes]:
+    """Wrap ``keys`` under ``kek``; ``pad`` selects RFC 5649 for arbitrary lengths."""
+    aes = _engine(kek)
+    if not pad:
+        for key in keys:
+            if len(key) < 16 or len(key) % 8:
+                raise ValueError("RFC 3394 keys must be a multiple of 8 bytes, at least 16")
+        return _wrap(aes, [IV] * len(keys), [_semiblocks(key) for key in keys])
+
+    ivs, items = [], []
+    for key in keys:
+        if not 0 < len(key) < 2**32:
+            raise ValueError("RFC 5649 keys must be between 1 and 2**32 - 1 bytes")
+        ivs.append((AIV_PREFIX << 32) | len(key))
+        items.append(_semiblocks(key + bytes(-len(key) % 8)))
+
+    wrapped = [b""] * len(keys)
+    long = [k for k, item in enumerate(items) if len(item) > 1]
+    for k, out in zip(long, _wrap(aes, [ivs[k] for k in long], [items[k] for k in long])):
+        wrapped[k] = out
+    # a single padded semiblock is wrapped as one plain block encryption
+    short = [k for k, item in enumerate(items) if len(item) == 1]
+    for k, block in zip(short, aes.encrypt_blocks([(ivs[k] << 64) | items[k][0] for k in short])):
+        wrapped[k] = block.to_bytes(16, "big")
+    return wrapped
+
+
+def _check_padded(a: int, r: list[int]) -> bytes | None:
+    length = a & 0xFFFFFFFF
+    if a >> 32 != AIV_PREFIX or not 8 * (len(r) - 1) < length <= 8 * len(r):
+        return None
+    data = _join(0, r)[8:]
+    if any(data[length:]):
+        return None
+    return data[:length]
+
+
+@metrics.mode("keywrap")
+def unwrap_many(kek: int, wrapped: list[bytes], pad: bool = False) -> list[bytes | None]:
+    """Unwrap ``wrapped`` under ``kek``, with ``None`` for every item that fails."""
+    aes = _engine(kek)
+    results: list[bytes | None] = [None] * len(wrapped)
+    shortest = 16 if pad else 24
+    valid = [k for k, item in enumerate(wrapped) if len(item) >= shortest and len(item) % 8 == 0]
+    long = [k for k in valid if len(wrapped[k]) > 16 or not pad]
+    for k, (a, r) in zip(long, _unwrap(aes, [_semiblocks(wrapped[k]) for k in long])):
+        if pad:
+            results[k] = _check_padded(a, r)
+        elif a == IV:
+            results[k] = _join(a, r)[8:]
+
+    short = [k for k in valid if len(wrapped[k]) == 16 and pad]
+    for k, block in zip(short, aes.decrypt_blocks([int.from_bytes(wrapped[k], "big") for k in short])):
+        results[k] = _check_padded(block >> 64, [block & _MASK64])
+    return results
+
+
+def wrap(kek: int, key: bytes, pad: bool = False) -> bytes:
+    return wrap_many(kek, [key], pad)[0]
+
+
+def unwrap(kek: int, wrapped: bytes, pad: bool = False) -> bytes:
+    """Unwrap one key, raising ``KeyWrapError`` if it fails its integrity check."""
+    key = unwrap_many(kek, [wrapped], pad)[0]
+    if key is None:
+        raise KeyWrapError("wrapped key failed its integrity check")
+    return key
@@ -0,0 +1,156 @@
+"""Always-on operational metrics.
+
+The library reports events to one process-wide collector:
+
+    aes256_blocks_total{mode, direction, key_bits}      counter
+    aes256_bytes_total{mode, direction, key_bits}       counter
+    aes256_key_expansions_total{key_bits}               counter
+    aes256_cache_total{cache, result}                   counter, result is hit or miss
+    aes256_batch_blocks{direction}                      histogram of blocks per pass
+    aes256_seconds{op}                                  histogram, op is encrypt, decrypt, mixed,
+                                                        reencrypt, rekey or key_setup
+
+``mode`` is "ecb" for direct block calls and is set by the higher-level
+modules ("ctr", "cmac", "keywrap", "reencrypt") for the passes they make, so every block
+is counted once. The default collector is an in-process ``Registry``, which
+costs a lock and a few dictionary updates per batched call and renders
+itself in the Prometheus text format. ``set_collector`` swaps in any other
+``Collector`` (or ``None`` to drop everything).
+"""
+
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# upper bounds, in blocks and in seconds
+BATCH_BUCKETS = tuple(1 << i for i in range(0, 21, 2))
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+BUCKETS = {"aes256_batch_blocks": BATCH_BUCKETS, "aes256_seconds": LATENCY_BUCKETS}
+
+_mode: ContextVar[str] = ContextVar("aes256_mode", default="ecb")
+
+
+class Collector:
+    """Receives metric events; this base class drops them."""
+
+    def inc(self, name: str, value: float, labels: tuple):
+        pass
+
+    def observe(self, name: str, value: float, labels: tuple):
+        pass
+
+
+class Registry(Collector):
+    """Counters and histograms kept in memory and exported as Prometheus text."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[tuple[str, tuple], float] = {}
+        # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self.histograms: dict[tuple[str, tuple], list] = {}
+
+    def inc(self, name: str, value: float, labels: tuple):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: tuple):
+        buckets = BUCKETS.get(name, LATENCY_BUCKETS)
+        key = (name, labels)
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [0] * (len(buckets) + 2)
+            h[bisect_left(buckets, value)] += 1
+            h[-1] += value
+
+    def value(self, name: str, **labels) -> float:
+        """Current value of one counter, 0 if it was never incremented."""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def count(self, name: str, **labels) -> int:
+        """Number of observations in one histogram."""
+        h = self.histograms.get((name, tuple(sorted(labels.items()))))
+        return sum(h[:-1]) if h else 0
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(h)) for key, h in self.histograms.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), h in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            total = 0
+            for bound, n in zip((*BUCKETS.get(name, LATENCY_BUCKETS), "+Inf"), h[:-1]):
+                total += n
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {total}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(h[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = Registry()
+_collector: Collector = registry
+
+
+def set_collector(collector: Collector | None):
+    """Route all metric events to ``collector``; ``None`` turns metrics off."""
+    global _collector
+    _collector = Collector() if collector is None else collector
+
+
+def get_collector() -> Collector:
+    return _collector
+
+
+def inc(name: str, value: float = 1, **labels):
+    _collector.inc(name, value, tuple(sorted(labels.items())))
+
+
+def observe(name: str, value: float, **labels):
+    _collector.observe(name, value, tuple(sorted(labels.items())))
+
+
+@contextmanager
+def mode(name: str):
+    """Attribute the cipher passes made inside this block to mode ``name``."""
+    token = _mode.set(name)
+    try:
+        yield
+    finally:
+        _mode.reset(token)
+
+
+def current_mode() -> str:
+    return _mode.get()
+
+
+def prometheus() -> str:
+    """The default registry in Prometheus text format."""
+    return registry.prometheus()
@@ -0,0 +1,51 @@
+"""Thread-pool execution of large block lists.
+
+An ``AES`` engine holds nothing but an immutable ``RoundKeys`` object, so one
+engine can be shared by any number of threads. ``map_encrypt`` splits the
+input into batches and runs them on a ``ThreadPoolExecutor``: while one batch
+is on the device, where the compiled kernel runs with the GIL released, other
+threads pack and unpack their batches. TinyGrad itself is not thread-safe, so
+the device passes are serialized on ``aes256.aes``'s device thread; the gain
+comes from overlapping them with the Python-side work around every batch.
+"""
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from itertools import chain
+
+from aes256.aes import AES
+
+DEFAULT_BATCH_SIZE = 4096
+
+
+def _map(fn, blocks: list[int], batch_size: int, workers: int | None, executor: Executor | None) -> list[int]:
+    batches = [blocks[i : i + batch_size] for i in range(0, len(blocks), batch_size)]
+    if executor is not None:
+        return list(chain.from_iterable(executor.map(fn, batches)))
+    with ThreadPoolExecutor(workers) as pool:
+        return list(chain.from_iterable(pool.map(fn, batches)))
+
+
+def map_encrypt(
+    aes: AES,
+    blocks: list[int],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int | None = None,
+    executor: Executor | None = None,
+) -> list[int]:
+    """Encrypt ``blocks`` in ``batch_size`` batches spread over a thread pool.
+
+    Uses ``executor`` when given, otherwise a fresh pool of ``workers`` threads.
+    Output order matches input order.
+    """
+    return _map(aes.encrypt_blocks, blocks, batch_size, workers, executor)
+
+
+def map_decrypt(
+    aes: AES,
+    blocks: list[int],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int | None = None,
+    executor: Executor | None = None,
+) -> list[int]:
+    """Decrypt ``blocks`` in ``batch_size`` batches spread over a thread pool."""
+    return _map(aes.decrypt_blocks, blocks, batch_size, workers, executor)
@@ -0,0 +1,171 @@
+"""Streaming re-encryption for key rotation.
+
+``reencrypt`` moves data from one key to another without ever forming the
+plaintext in Python. Both key schedules are built once per process, and
+each chunk is one fused pass:
+
+    ecb  decrypt under the old key and encrypt under the new key in the same
+         kernel, so the plaintext only exists on the device
+    ctr  the pass computes E_old(counter) ^ E_new(counter), which is XORed into
+         the ciphertext to swap one keystream for the other; the plaintext is
+         never formed at all. Counter blocks are ``nonce || u32 block index``,
+         as in ``aes256.framing``, and the nonce is kept.
+
+Chunks are independent, so they can be prepared on a thread pool while
+reading and writing stay in order on the calling thread. The pool only
+overlaps the Python-side packing and XOR work: the cipher passes themselves
+run one at a time on ``aes256.aes``'s device thread. Process pools are
+rejected, as TinyGrad cannot be used from a forked child.
+
+With a ``checkpoint`` path, progress is saved after every chunk that reaches
+the sink, and an interrupted run resumes from the last saved offset. The
+checkpoint records a key check value for each key (the first bytes of E(0),
+which reveal nothing about the key) and a digest of the last committed source
+chunk, so a resume with other keys or another source is refused rather than
+leaving a file encrypted under two keys.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from aes256 import metrics
+from aes256.aes import AES
+
+MODES = ("ecb", "ctr")
+DEFAULT_CHUNK_SIZE = 1 << 20
+# chunks in flight on the executor
+WINDOW = 16
+# ctr counter blocks end in a 32-bit block index
+MAX_CTR_BLOCKS = 2**32
+
+
+@lru_cache(maxsize=16)
+def engines(old_key: int, new_key: int) -> tuple[AES, AES]:
+    """The old and new engines, expanded once per process and reused for every chunk."""
+    return AES(old_key), AES(new_key)
+
+
+@metrics.mode("reencrypt")
+def _transform(old_key: int, new_key: int, mode: str, nonce: bytes | None, first: int, data: bytes) -> bytes:
+    """Re-encrypt one chunk whose first block is block ``first`` of the stream."""
+    old, new = engines(old_key, new_key)
+    n = len(data)
+    blocks = [int.from_bytes(data[i : i + 16], "big") for i in range(0, n, 16)]
+    if mode == "ecb":
+        return b"".join(block.to_bytes(16, "big") for block in old.reencrypt_blocks(blocks, new))
+    prefix = int.from_bytes(nonce, "big") << 32
+    delta = old.keystream_delta([prefix | (first + i) for i in range(len(blocks))], new)
+    pad = b"".join(block.to_bytes(16, "big") for block in delta)[:n]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(pad, "big")).to_bytes(n, "big")
+
+
+def key_check(aes: AES) -> str:
+    """The key check value of an engine: the first three bytes of E(0), in hex."""
+    return aes.encrypt(0).to_bytes(16, "big")[:3].hex()
+
+
+def _load_checkpoint(path, settings: dict, keys: list[str], source) -> int:
+    """The offset to resume from, once the keys and the source match the checkpoint."""
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return 0
+    if {k: saved.get(k) for k in settings} != settings:
+        raise ValueError(f"checkpoint {path} was written with different settings")
+    if saved.get("keys") != keys:
+        raise ValueError(f"checkpoint {path} was written for different keys")
+    offset, size = saved["offset"], saved["tail_size"]
+    source.seek(offset - size)
+    if hashlib.sha256(source.read(size)).hexdigest() != saved["tail"]:
+        raise ValueError(f"source does not match checkpoint {path}")
+    return offset
+
+
+def _save_checkpoint(path, state: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _sync(sink):
+    sink.flush()
+    # in-memory sinks have no file descriptor to sync
+    with contextlib.suppress(AttributeError, OSError):
+        os.fsync(sink.fileno())
+
+
+def reencrypt(
+    old_key: int,
+    new_key: int,
+    source,
+    sink,
+    mode: str = "ecb",
+    nonce: bytes | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    executor: ThreadPoolExecutor | None = None,
+    checkpoint: str | os.PathLike | None = None,
+) -> int:
+    """Stream ``source`` to ``sink``, re-encrypting from ``old_key`` to ``new_key``.
+
+    ``source`` and ``sink`` are binary file objects; resuming from a
+    ``checkpoint`` seeks both to the saved offset. Chunks of ``chunk_size``
+    bytes are transformed on ``executor``, a thread pool, when one is given.
+    The checkpoint file is removed once the stream is done. Returns the
+    stream length.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if mode == "ctr" and (nonce is None or len(nonce) != 12):
+        raise ValueError("ctr mode needs the stream's 12-byte nonce")
+    if not chunk_size or chunk_size % 16:
+        raise ValueError("chunk_size must be a positive multiple of 16")
+    if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+        raise TypeError("executor must be a ThreadPoolExecutor; TinyGrad cannot run in forked processes")
+
+    settings = {"mode": mode, "chunk_size": chunk_size, "nonce": nonce.hex() if nonce else None}
+    keys = [key_check(aes) for aes in engines(old_key, new_key)] if checkpoint is not None else []
+    offset = 0 if checkpoint is None else _load_checkpoint(checkpoint, settings, keys, source)
+    if offset:
+        source.seek(offset)
+        sink.seek(offset)
+
+    pending: deque = deque()
+    written = offset
+
+    def finish():
+        nonlocal written
+        future, length, tail = pending.popleft()
+        sink.write(future.result() if executor is not None else future)
+        written += length
+        if checkpoint is not None:
+            _sync(sink)
+            _save_checkpoint(checkpoint, {**settings, "keys": keys, "offset": written, "tail": tail, "tail_size": length})
+
+    read = offset
+    while data := source.read(chunk_size):
+        if mode == "ecb" and len(data) % 16:
+            raise ValueError("ecb data must be a multiple of 16 bytes")
+        if mode == "ctr" and -(-(read + len(data)) // 16) > MAX_CTR_BLOCKS:
+            raise ValueError("stream is too large for a 32-bit block counter")
+        args = (old_key, new_key, mode, nonce, read // 16, data)
+        tail = hashlib.sha256(data).hexdigest() if checkpoint is not None else None
+        future = _transform(*args) if executor is None else executor.submit(_transform, *args)
+        pending.append((future, len(data), tail))
+        read += len(data)
+        if len(pending) >= (WINDOW if executor is not None else 1):
+            finish()
+    while pending:
+        finish()
+
+    sink.flush()
+    if checkpoint is not None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(checkpoint)
+    return written
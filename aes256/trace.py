@@ -0,0 +1,36 @@
+"""Round-by-round state traces in the FIPS-197 Appendix C layout.
+
+A trace is a list of ``(label, value)`` pairs such as
+``("round[ 1].s_box", 0x63cab7040953d051cd60e0e7ba70e18c)``. Every engine
+that supports tracing fills the same labels in the same order, so two traces
+of one block can be compared line by line with ``diff_traces``.
+"""
+
+
+class Recorder:
+    """Appends states of one batch lane to a trace, numbering rounds as it goes."""
+
+    def __init__(self, trace: list, lane: int = 0, inverse: bool = False):
+        self.trace = trace
+        self.lane = lane
+        self.prefix = "i" if inverse else ""
+        self.round = 0
+
+    def __call__(self, step: str, value: int):
+        if step == "start":
+            self.round += 1
+        self.trace.append((f"round[{self.round:2d}].{self.prefix}{step}", value))
+
+
+def format_trace(trace: list[tuple[str, int]]) -> str:
+    return "\n".join(f"{label:<18}{value:032x}" for label, value in trace)
+
+
+def diff_traces(expected: list[tuple[str, int]], actual: list[tuple[str, int]]) -> int | None:
+    """Index of the first entry where two traces disagree, or None if they match."""
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return i
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual))
+    return None
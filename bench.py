@@ -1,6 +1,13 @@
+import os
 import random
+import tempfile
 import pytest
-from aes256.aes import AES as TinyGradAES
+from aes256.aes import AES as TinyGradAES, default_device, memory_per_block, peak_memory, reset_peak_memory
+from aes256 import metrics
+from aes256.cmac import cmac_many
+from aes256.daemon import Client, Daemon
+from aes256.keywrap import unwrap_many, wrap_many
+from aes256.parallel import map_encrypt
 from tests.reference.aes import AES as ReferenceAES
 
 
@@ -22,6 +29,154 @@ def test_aes_performance(benchmark, aes_class, num_ops):
 
     benchmark.pedantic(aes_ops, rounds=10, iterations=10)
 
+# comma-separated TinyGrad devices to compare, e.g. AES256_BENCH_DEVICES=LLVM,CPU,PYTHON
+DEVICES = [d for d in os.environ.get("AES256_BENCH_DEVICES", "").split(",") if d] or [default_device()]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("device", DEVICES)
+@pytest.mark.parametrize("direction", ["encrypt", "decrypt"])
+def test_batched_throughput(benchmark, direction, device):
+    """Encryption and decryption share one round structure and should run at the same rate."""
+    aes = TinyGradAES(random.getrandbits(128), device=device)
+    blocks = [random.getrandbits(128) for _ in range(4096)]
+    run = getattr(aes, f"{direction}_blocks")
+    # the first call compiles, the second captures the kernels
+    run(blocks)
+    run(blocks)
+
+    benchmark.extra_info["blocks"] = len(blocks)
+    benchmark.extra_info["device"] = aes.device
+    benchmark.pedantic(run, args=(blocks,), rounds=10, iterations=1)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("workers", [1, 2, 4, 8])
+def test_thread_scaling(benchmark, workers):
+    """Blocks/s of map_encrypt over a shared engine; workers=1 is the baseline."""
+    aes = TinyGradAES(random.getrandbits(128))
+    blocks = [random.getrandbits(128) for _ in range(1 << 16)]
+    map_encrypt(aes, blocks[:8192], workers=workers)
+
+    benchmark.extra_info["blocks"] = len(blocks)
+    benchmark.pedantic(map_encrypt, args=(aes, blocks), kwargs={"workers": workers}, rounds=5, iterations=1)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("num_messages", [1, 64, 4096])
+def test_cmac_many(benchmark, num_messages):
+    """Tags per second should grow with the number of messages per call."""
+    key = random.getrandbits(128)
+    messages = [random.randbytes(random.randrange(16, 128)) for _ in range(num_messages)]
+    cmac_many(key, messages)
+    cmac_many(key, messages)
+
+    benchmark.extra_info["messages"] = num_messages
+    benchmark.pedantic(cmac_many, args=(key, messages), rounds=5, iterations=1)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("num_keys", [1, 1000])
+def test_unwrap_many(benchmark, num_keys):
+    """Unwrapping a directory of 256-bit data keys costs 24 batched calls, whatever its size."""
+    kek = random.getrandbits(128)
+    wrapped = wrap_many(kek, [random.randbytes(32) for _ in range(num_keys)])
+    unwrap_many(kek, wrapped)
+    unwrap_many(kek, wrapped)
+
+    benchmark.extra_info["keys"] = num_keys
+    benchmark.pedantic(unwrap_many, args=(kek, wrapped), rounds=5, iterations=1)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("batch", [1, 4096])
+@pytest.mark.parametrize("collector", ["registry", "off"])
+def test_metrics_overhead(benchmark, collector, batch):
+    """Encrypt calls with the default registry collecting versus metrics turned off."""
+    aes = TinyGradAES(random.getrandbits(128))
+    blocks = [random.getrandbits(128) for _ in range(batch)]
+    aes.encrypt_blocks(blocks)
+    aes.encrypt_blocks(blocks)
+
+    def run():
+        for _ in range(20):
+            aes.encrypt_blocks(blocks)
+
+    metrics.set_collector(metrics.registry if collector == "registry" else None)
+    try:
+        benchmark.extra_info["blocks"] = 20 * batch
+        benchmark.pedantic(run, rounds=5, iterations=1)
+    finally:
+        metrics.set_collector(metrics.registry)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("batch", [1, 256])
+def test_daemon_request(benchmark, batch):
+    """Round trip of one request through a warmed-up local daemon over a pooled connection."""
+    key = random.getrandbits(128)
+    blocks = [random.getrandbits(128) for _ in range(batch)]
+    with tempfile.TemporaryDirectory() as directory, Daemon(f"{directory}/d.sock", {1: key}, warm=(batch,)) as daemon:
+        daemon.start()
+        with Client(daemon.path) as client:
+            client.encrypt_blocks(1, blocks)
+            benchmark.extra_info["blocks"] = batch
+            benchmark.pedantic(client.encrypt_blocks, args=(1, blocks), rounds=20, iterations=5)
+        daemon.shutdown()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("chunk", [1 << 10, 1 << 13, 1 << 16])
+def test_chunked_throughput(benchmark, chunk):
+    """64K blocks under budgets of 1K, 8K and 64K blocks; peak device memory goes in extra_info."""
+    aes = TinyGradAES(random.getrandbits(128))
+    blocks = [random.getrandbits(128) for _ in range(1 << 16)]
+    aes.encrypt_blocks(blocks[:chunk])
+    aes.encrypt_blocks(blocks[:chunk])
+    aes.memory_budget = chunk * memory_per_block()
+
+    reset_peak_memory()
+    benchmark.extra_info["blocks"] = len(blocks)
+    benchmark.pedantic(aes.encrypt_blocks, args=(blocks,), rounds=5, iterations=1)
+    benchmark.extra_info["peak_memory"] = peak_memory()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("batch", [64, 4096])
+@pytest.mark.parametrize("strategy", ["mixed", "split"])
+def test_mixed_queue(benchmark, strategy, batch):
+    """A half-encrypt, half-decrypt queue as one masked pass versus two single-direction passes."""
+    aes = TinyGradAES(random.getrandbits(128))
+    blocks = [random.getrandbits(128) for _ in range(batch)]
+    decrypt = [random.random() < 0.5 for _ in blocks]
+
+    def split():
+        aes.encrypt_blocks([b for b, d in zip(blocks, decrypt) if not d])
+        aes.decrypt_blocks([b for b, d in zip(blocks, decrypt) if d])
+
+    run = split if strategy == "split" else lambda: aes.crypt_blocks(blocks, decrypt)
+    run()
+    run()
+    benchmark.extra_info["blocks"] = batch
+    benchmark.pedantic(run, rounds=10, iterations=1)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("strategy", ["fused", "separate"])
+def test_reencrypt_pass(benchmark, strategy):
+    """Key rotation of 64K blocks as one fused pass versus a decrypt pass and an encrypt pass."""
+    old, new = TinyGradAES(random.getrandbits(128)), TinyGradAES(random.getrandbits(128))
+    blocks = [random.getrandbits(128) for _ in range(1 << 16)]
+
+    if strategy == "fused":
+        run = lambda: old.reencrypt_blocks(blocks, new)
+    else:
+        run = lambda: new.encrypt_blocks(old.decrypt_blocks(blocks))
+    run()
+    run()
+    benchmark.extra_info["blocks"] = len(blocks)
+    benchmark.pedantic(run, rounds=5, iterations=1)
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "--benchmark-only"])
@@ -0,0 +1,108 @@
+"""Differential fuzzing of every AES engine against the reference oracle.
+
+Generates random (key, block) pairs, runs them through each engine in large
+batches and compares against ``tests/reference/aes.py``. The first mismatch
+is minimized to a single block, re-run on its own, and traced round by round
+in both the reference and the engine up to the first step where they diverge.
+
+    uv run python fuzz.py --blocks 1000000 --batch 65536
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from aes256.trace import diff_traces, format_trace
+from tests.engines import ENGINES, SLOW_ENGINES
+
+
+def find_mismatch(expected: list[int], actual: list[int]) -> int | None:
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return i
+    return None
+
+
+def report(name, make, direction, key, block, want, got, lone):
+    print(f"\nMISMATCH in {name} ({direction})")
+    print(f"key      {key:032x}")
+    print(f"input    {block:032x}")
+    print(f"expected {want:032x}")
+    print(f"batched  {got:032x}")
+    if lone == got:
+        print("single   reproduces on its own")
+    else:
+        print(f"single   {lone:032x} (only fails inside a batch)")
+
+    traces = {}
+    for engine, factory in (("reference", ENGINES["reference"]), (name, make)):
+        traces[engine] = []
+        getattr(factory([key]), f"{direction}_blocks")([block], trace=traces[engine])
+    expected, actual = traces["reference"], traces[name]
+    i = diff_traces(expected, actual)
+    if i is None:
+        print("\nround states agree with the reference:")
+        print(format_trace(expected))
+        return
+    print(f"\nfirst divergence at {expected[i][0]}")
+    print("reference rounds:")
+    print(format_trace(expected[: i + 1]))
+    print(f"{name} rounds:")
+    print(format_trace(actual[: i + 1]))
+
+
+def fuzz(engines: dict, blocks: int, batch: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    elapsed = dict.fromkeys(engines, 0.0)
+    done = 0
+    while done < blocks:
+        n = min(batch, blocks - done)
+        keys = [rng.getrandbits(128) for _ in range(n)]
+        plaintexts = [rng.getrandbits(128) for _ in range(n)]
+        oracle = ENGINES["reference"](keys)
+        ciphertexts = oracle.encrypt_blocks(plaintexts)
+
+        for name, make in engines.items():
+            start = time.perf_counter()
+            aes = make(keys)
+            encrypted = aes.encrypt_blocks(plaintexts)
+            decrypted = aes.decrypt_blocks(ciphertexts)
+            elapsed[name] += time.perf_counter() - start
+
+            for direction, inputs, want, got in (
+                ("encrypt", plaintexts, ciphertexts, encrypted),
+                ("decrypt", ciphertexts, plaintexts, decrypted),
+            ):
+                i = find_mismatch(want, got)
+                if i is None:
+                    continue
+                lone = getattr(make([keys[i]]), f"{direction}_blocks")([inputs[i]])[0]
+                report(name, make, direction, keys[i], inputs[i], want[i], got[i], lone)
+                return False
+
+        done += n
+        print(f"{done}/{blocks} blocks ok", file=sys.stderr)
+
+    for name, seconds in elapsed.items():
+        print(f"{name:<16}{2 * blocks / seconds:>14,.0f} blocks/s")
+    return True
+
+
+if __name__ == "__main__":
+    available = {**ENGINES, **SLOW_ENGINES}
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--engines",
+        default=",".join(name for name in ENGINES if name != "reference"),
+        help=f"comma-separated subset of: {', '.join(available)}",
+    )
+    args = parser.parse_args()
+
+    seed = random.randrange(2**32) if args.seed is None else args.seed
+    print(f"seed {seed}", file=sys.stderr)
+    engines = {name: available[name] for name in args.engines.split(",")}
+    sys.exit(0 if fuzz(engines, args.blocks, args.batch, seed) else 1)
@@ -0,0 +1,93 @@
+from aes256.aes import AES as TinyGradAES, expand_key
+from aes256.trace import Recorder
+from tests.reference.aes import AES as ReferenceAES, text2matrix, matrix2text
+
+
+def trace_reference(aes: ReferenceAES, block: int, note: Recorder) -> int:
+    """Step the reference through one block, recording the same states as ``aes256.aes``.
+
+    Decryption follows the FIPS-197 equivalent inverse cipher like the engine
+    does, with the reference's InvMixColumns applied to the inner round keys.
+    """
+    decrypt = note.prefix == "i"
+    keys = [aes.round_keys[4 * r : 4 * (r + 1)] for r in range(11)]
+    if decrypt:
+        keys = [[list(word) for word in k] for k in reversed(keys)]
+        for k in keys[1:10]:
+            aes._AES__inv_mix_columns(k)
+    keys = [matrix2text(k) for k in keys]
+    s = text2matrix(block)
+
+    def step(name, transform=None):
+        if transform is not None:
+            transform(s)
+        note(name, matrix2text(s))
+
+    step("input")
+    note("k_sch", keys[0])
+    aes._AES__add_round_key(s, text2matrix(keys[0]))
+    for r in range(1, 11):
+        step("start")
+        if decrypt:
+            step("s_box", aes._AES__inv_sub_bytes)
+            step("s_row", aes._AES__inv_shift_rows)
+            if r < 10:
+                step("m_col", aes._AES__inv_mix_columns)
+        else:
+            step("s_box", aes._AES__sub_bytes)
+            step("s_row", aes._AES__shift_rows)
+            if r < 10:
+                step("m_col", aes._AES__mix_columns)
+        note("k_sch", keys[r])
+        aes._AES__add_round_key(s, text2matrix(keys[r]))
+    step("output")
+    return matrix2text(s)
+
+
+class ReferenceLanes:
+    """The pure-Python reference keyed per lane, one block per key."""
+
+    def __init__(self, keys):
+        self.ciphers = [ReferenceAES(key) for key in keys]
+
+    def encrypt_blocks(self, blocks, trace=None, lane=0):
+        if trace is not None:
+            trace_reference(self.ciphers[lane], blocks[lane], Recorder(trace, lane))
+        return [aes.encrypt(block) for aes, block in zip(self.ciphers, blocks)]
+
+    def decrypt_blocks(self, blocks, trace=None, lane=0):
+        if trace is not None:
+            trace_reference(self.ciphers[lane], blocks[lane], Recorder(trace, lane, inverse=True))
+        return [aes.decrypt(block) for aes, block in zip(self.ciphers, blocks)]
+
+
+class TinyGradSingle:
+    """The TinyGrad cipher driven one ``AES.encrypt``/``AES.decrypt`` call per block."""
+
+    def __init__(self, keys):
+        self.ciphers = [TinyGradAES(key) for key in keys]
+
+    def encrypt_blocks(self, blocks, trace=None, lane=0):
+        return [aes.encrypt(block, trace if i == lane else None) for i, (aes, block) in enumerate(zip(self.ciphers, blocks))]
+
+    def decrypt_blocks(self, blocks, trace=None, lane=0):
+        return [aes.decrypt(block, trace if i == lane else None) for i, (aes, block) in enumerate(zip(self.ciphers, blocks))]
+
+
+def tinygrad_lanes(keys):
+    """The batched TinyGrad engine with one key schedule per lane."""
+    return TinyGradAES.from_schedule(b"".join(expand_key(key) for key in keys))
+
+
+# ENGINES[name](keys) returns an object whose encrypt_blocks/decrypt_blocks
+# take exactly one block per key and process the whole list as one batch;
+# both accept trace=list, lane=k to record lane k in aes256.trace layout
+ENGINES = {
+    "reference": ReferenceLanes,
+    "tinygrad": tinygrad_lanes,
+}
+
+# engines too slow to run over whole vector sets, fuzzed on request only
+SLOW_ENGINES = {
+    "tinygrad-single": TinyGradSingle,
+}
@@ -1,5 +1,5 @@
 import pytest
-from aes256.aes import AES
+from aes256.aes import AES, decryption_schedule, expand_key
 
 
 class TestAESEncryptDecrypt:
@@ -55,5 +55,14 @@ class TestAESEncryptDecrypt:
         assert aes.decrypt(ciphertext) == plaintext
 
 
+def test_decryption_schedule():
+    """Equivalent inverse cipher keys from FIPS-197 Appendix C.1"""
+    schedule = expand_key(0x000102030405060708090A0B0C0D0E0F)
+    inverse = decryption_schedule(schedule)
+    assert inverse[:16] == schedule[160:]
+    assert inverse[16:32].hex() == "13aa29be9c8faff6f770f58000f7bf03"
+    assert inverse[160:] == schedule[:16]
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
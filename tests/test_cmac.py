@@ -0,0 +1,40 @@
+import os
+import random
+
+import pytest
+from aes256.cmac import cmac, cmac_many, subkeys
+
+# RFC 4493 section 4
+KEY = 0x2B7E151628AED2A6ABF7158809CF4F3C
+MESSAGE = bytes.fromhex(
+    "6bc1bee22e409f96e93d7e117393172a"
+    "ae2d8a571e03ac9c9eb76fac45af8e51"
+    "30c81c46a35ce411e5fbc1191a0a52ef"
+    "f69f2445df4f9b17ad2b417be66c3710"
+)
+EXAMPLES = [
+    (0, "bb1d6929e95937287fa37d129b756746"),
+    (16, "070a16b46b4d4144f79bdd9dd04a287c"),
+    (40, "dfa66747de9ae63030ca32611497c827"),
+    (64, "51f0bebf7e3b9d92fc49741779363cfe"),
+]
+
+
+def test_subkeys():
+    _, k1, k2 = subkeys(KEY)
+    assert k1 == 0xFBEED618357133667C85E08F7236A8DE
+    assert k2 == 0xF7DDAC306AE266CCF90BC11EE46D513B
+
+
+@pytest.mark.parametrize("length,tag", EXAMPLES)
+def test_rfc4493_examples(length, tag):
+    assert cmac(KEY, MESSAGE[:length]).hex() == tag
+
+
+def test_many_matches_single():
+    messages = [os.urandom(random.randrange(0, 80)) for _ in range(50)]
+    messages += [MESSAGE[:length] for length, _ in EXAMPLES]
+    tags = cmac_many(KEY, messages)
+    assert tags[-4:] == [bytes.fromhex(t) for _, t in EXAMPLES]
+    assert tags[:5] == [cmac(KEY, m) for m in messages[:5]]
+    assert cmac_many(KEY, []) == []
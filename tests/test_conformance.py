@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from .engines import ENGINES
+
+VECTORS = Path(__file__).parent / "vectors"
+KAT = ["ECBGFSbox128", "ECBKeySbox128", "ECBVarKey128", "ECBVarTxt128"]
+
+
+def load_vectors(name):
+    """Read a vector file: one ``KEY PLAINTEXT CIPHERTEXT`` hex triple per line."""
+    rows = []
+    for line in (VECTORS / f"{name}.txt").read_text().splitlines():
+        if line and not line.startswith("#"):
+            rows.append(tuple(int(field, 16) for field in line.split()))
+    return [list(column) for column in zip(*rows)]
+
+
+@pytest.fixture(params=list(ENGINES))
+def engine(request):
+    return ENGINES[request.param]
+
+
+@pytest.mark.parametrize("name", KAT)
+def test_known_answer_encrypt(engine, name):
+    keys, plaintexts, ciphertexts = load_vectors(name)
+    assert engine(keys).encrypt_blocks(plaintexts) == ciphertexts
+
+
+@pytest.mark.parametrize("name", KAT)
+def test_known_answer_decrypt(engine, name):
+    keys, plaintexts, ciphertexts = load_vectors(name)
+    assert engine(keys).decrypt_blocks(ciphertexts) == plaintexts
+
+
+def test_monte_carlo_encrypt(engine):
+    """Every record is 1000 chained encryptions; all records run in lockstep."""
+    keys, blocks, ciphertexts = load_vectors("ECBMCT128")
+    aes = engine(keys)
+    for _ in range(1000):
+        blocks = aes.encrypt_blocks(blocks)
+    assert blocks == ciphertexts
+
+
+def test_monte_carlo_decrypt(engine):
+    keys, plaintexts, blocks = load_vectors("ECBMCT128")
+    aes = engine(keys)
+    for _ in range(1000):
+        blocks = aes.decrypt_blocks(blocks)
+    assert blocks == plaintexts
+
+
+def test_monte_carlo_key_chain():
+    """Each record's key is the previous key XOR the previous final ciphertext."""
+    keys, plaintexts, ciphertexts = load_vectors("ECBMCT128")
+    for i in range(1, len(keys)):
+        assert keys[i] == keys[i - 1] ^ ciphertexts[i - 1]
+        assert plaintexts[i] == ciphertexts[i - 1]
@@ -0,0 +1,91 @@
+import os
+import random
+import shutil
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from aes256.daemon import REQUEST, RESPONSE, STATUS_ERROR, Client, Daemon, DaemonError, load_keys
+from .reference.aes import AES as ReferenceAES
+
+KEYS = {1: 0x2B7E151628AED2A6ABF7158809CF4F3C, 7: 0x000102030405060708090A0B0C0D0E0F}
+
+
+@pytest.fixture(scope="module")
+def daemon():
+    # AF_UNIX paths are limited to about 100 bytes, so keep it short
+    directory = tempfile.mkdtemp(prefix="aes256-")
+    daemon = Daemon(os.path.join(directory, "d.sock"), KEYS, warm=(1,), linger=0.005)
+    daemon.start()
+    yield daemon
+    daemon.shutdown()
+    daemon.server_close()
+    shutil.rmtree(directory)
+
+
+def test_roundtrip(daemon):
+    blocks = [random.getrandbits(128) for _ in range(10)]
+    with Client(daemon.path) as client:
+        ciphertexts = client.encrypt_blocks(7, blocks)
+        assert ciphertexts == [ReferenceAES(KEYS[7]).encrypt(b) for b in blocks]
+        assert client.decrypt_blocks(7, ciphertexts) == blocks
+        assert client.encrypt_blocks(1, []) == []
+        assert client.connections == 1
+
+
+def test_concurrent_requests_share_passes(daemon):
+    requests = [(random.choice(list(KEYS)), [random.getrandbits(128) for _ in range(3)]) for _ in range(32)]
+    before = daemon.batcher.passes
+    with Client(daemon.path, pool_size=32) as client, ThreadPoolExecutor(32) as pool:
+        results = list(pool.map(lambda r: client.encrypt_blocks(*r), requests))
+    for (key_id, blocks), out in zip(requests, results):
+        assert out == [ReferenceAES(KEYS[key_id]).encrypt(b) for b in blocks]
+    assert daemon.batcher.passes - before < len(requests)
+
+
+def test_unknown_key(daemon):
+    with Client(daemon.path) as client:
+        with pytest.raises(DaemonError, match="unknown key id 3"):
+            client.encrypt_blocks(3, [0])
+        # the connection stays usable after a rejected request
+        assert client.encrypt_blocks(1, [0]) == [ReferenceAES(KEYS[1]).encrypt(0)]
+        assert client.connections == 1
+
+
+def test_bad_op_closes_connection(daemon):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(daemon.path)
+        sock.sendall(REQUEST.pack(9, 1, 1))
+        status, count = RESPONSE.unpack(sock.recv(RESPONSE.size))
+        assert status == STATUS_ERROR
+        assert sock.recv(count).startswith(b"bad request")
+        assert sock.recv(1) == b""
+
+
+def test_load_keys(tmp_path):
+    path = tmp_path / "keys"
+    path.write_text("# tenant keys\n1:2b7e151628aed2a6abf7158809cf4f3c\n\n7:000102030405060708090a0b0c0d0e0f\n")
+    path.chmod(0o600)
+    assert load_keys(str(path)) == KEYS
+    path.chmod(0o640)
+    with pytest.raises(PermissionError, match="chmod 600"):
+        load_keys(str(path))
+
+
+def test_socket_path_must_be_a_socket(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"precious")
+    with pytest.raises(FileExistsError, match="not a socket"):
+        Daemon(str(path), KEYS, warm=())
+    assert path.read_bytes() == b"precious"
+
+
+def test_stale_socket_replaced():
+    directory = tempfile.mkdtemp(prefix="aes256-")
+    path = os.path.join(directory, "d.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(path)
+    daemon = Daemon(path, KEYS, warm=())
+    daemon.server_close()
+    shutil.rmtree(directory)
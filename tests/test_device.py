@@ -0,0 +1,51 @@
+import pytest
+from aes256 import aes as aes_module
+from aes256.aes import AES, default_device, set_default_device, tables
+from tests.reference.aes import AES as ReferenceAES
+
+KEY = 0x2B7E151628AED2A6ABF7158809CF4F3C
+BLOCKS = [0x3243F6A8885A308D313198A2E0370734, 0, 2**128 - 1]
+# the interpreted PYTHON backend is available everywhere, so it stands in for a second device
+OTHER = "PYTHON"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return AES(KEY, device=OTHER.lower())
+
+
+def test_engine_placement(engine):
+    assert engine.device == OTHER
+    assert {k.device for k in engine.keys.encrypt + engine.keys.decrypt} == {OTHER}
+    assert engine.round_keys.device == OTHER
+
+
+def test_results_match_across_devices(engine):
+    reference = ReferenceAES(KEY)
+    ciphertexts = engine.encrypt_blocks(BLOCKS)
+    assert ciphertexts == [reference.encrypt(b) for b in BLOCKS]
+    assert engine.decrypt_blocks(ciphertexts) == BLOCKS
+
+
+def test_change_key_keeps_device(engine):
+    other = AES.from_round_keys(engine.keys)
+    other.change_key(KEY ^ 1)
+    assert other.device == OTHER
+    assert engine.keys.schedule != other.keys.schedule
+
+
+def test_tables_copied_once_per_device():
+    assert tables(OTHER) is tables(OTHER.lower())
+    assert tables(OTHER)[0].device == OTHER
+    assert aes_module.Sbox is tables()[0]
+
+
+def test_default_device():
+    before = default_device()
+    try:
+        set_default_device(OTHER)
+        assert default_device() == OTHER
+        assert AES.from_schedule(bytes(176)).device == OTHER
+    finally:
+        set_default_device(None)
+    assert default_device() == before
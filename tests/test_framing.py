@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from aes256 import framing
+from aes256.framing import FramingError, HEADER, TAG_SIZE
+
+KEY = 0x2B7E151628AED2A6ABF7158809CF4F3C
+
+
+class TestFraming:
+    def setup_method(self):
+        self.data = os.urandom(5 * 64 + 7)
+        self.record = framing.encode(KEY, self.data, key_id=42, chunk_size=64)
+
+    def test_roundtrip(self):
+        assert framing.decode(KEY, self.record) == self.data
+
+    def test_header(self):
+        header = framing.read_header(self.record)
+        assert header.key_id == 42 and header.chunk_size == 64
+        assert framing.chunk_count(self.record) == 6
+
+    def test_fixed_overhead(self):
+        assert len(self.record) == HEADER.size + len(self.data) + 6 * TAG_SIZE
+
+    @pytest.mark.parametrize("size", [0, 16, 64, 128])
+    def test_edge_lengths(self, size):
+        data = os.urandom(size)
+        assert framing.decode(KEY, framing.encode(KEY, data, chunk_size=64)) == data
+
+    def test_single_chunk_and_early_stop(self):
+        assert framing.decode_chunk(KEY, self.record, 5) == self.data[320:]
+        assert next(framing.iter_decode(KEY, self.record)) == self.data[:64]
+        assert b"".join(framing.iter_decode(KEY, self.record)) == self.data
+
+    def test_thread_pool(self):
+        data = os.urandom(40 * 64)
+        with ThreadPoolExecutor(4) as pool:
+            record = framing.encode(KEY, memoryview(data), chunk_size=64, executor=pool)
+            assert framing.decode(KEY, record, executor=pool) == data
+        assert framing.decode(KEY, record) == data
+
+    def test_process_pool_rejected(self):
+        with ProcessPoolExecutor(1) as pool:
+            with pytest.raises(TypeError, match="ThreadPoolExecutor"):
+                framing.encode(KEY, self.data, chunk_size=64, executor=pool)
+            with pytest.raises(TypeError, match="ThreadPoolExecutor"):
+                framing.decode(KEY, self.record, executor=pool)
+
+    @pytest.mark.parametrize("nonce", [b"abc", bytes(20)])
+    def test_nonce_length(self, nonce):
+        with pytest.raises(ValueError, match="12 bytes"):
+            framing.encode(KEY, self.data, nonce=nonce)
+        assert framing.read_header(framing.encode(KEY, self.data, nonce=bytes(range(12)))).nonce == bytes(range(12))
+
+    def test_tampered_chunk(self):
+        self.record[HEADER.size + 2 * (64 + TAG_SIZE) + 3] ^= 1
+        assert framing.decode_chunk(KEY, self.record, 1) == self.data[64:128]
+        with pytest.raises(FramingError, match="chunk 2"):
+            framing.decode(KEY, self.record)
+
+    def test_truncated_at_chunk_boundary(self):
+        truncated = self.record[: HEADER.size + 3 * (64 + TAG_SIZE)]
+        with pytest.raises(FramingError, match="chunk 2"):
+            framing.decode(KEY, truncated)
+
+    def test_wrong_key(self):
+        with pytest.raises(FramingError):
+            framing.decode(KEY ^ 1, self.record)
@@ -0,0 +1,67 @@
+import random
+import tracemalloc
+
+import pytest
+from aes256 import aes as aes_module
+from aes256.aes import SCHEDULE_SIZE, expand_key
+from aes256.keystore import KeyHandle, KeyStore
+from .reference.aes import AES as ReferenceAES
+
+
+class TestKeyStore:
+    def setup_method(self):
+        self.keys = {f"tenant-{i}": random.getrandbits(128) for i in range(20)}
+        self.store = KeyStore(self.keys.items())
+
+    def test_contiguous_schedules(self):
+        assert len(self.store) == 20
+        assert len(self.store.schedules) == 20 * SCHEDULE_SIZE
+        assert bytes(self.store["tenant-3"].schedule) == expand_key(self.keys["tenant-3"])
+
+    def test_replace_keeps_slot(self):
+        handle = self.store["tenant-5"]
+        self.store.add("tenant-5", 42)
+        assert len(self.store.schedules) == 20 * SCHEDULE_SIZE
+        assert bytes(handle.schedule) == expand_key(42)
+
+    def test_batched_gather(self):
+        ids = random.choices(list(self.keys), k=12)
+        blocks = [random.getrandbits(128) for _ in ids]
+        expected = [ReferenceAES(self.keys[i]).encrypt(b) for i, b in zip(ids, blocks)]
+        assert self.store.encrypt_blocks(ids, blocks) == expected
+        assert self.store.decrypt_blocks(ids, expected) == blocks
+
+    def test_one_key_id_per_block(self):
+        for ids in (["tenant-0"], ["tenant-0", "tenant-1", "tenant-2"]):
+            with pytest.raises(ValueError, match="one key id per block"):
+                self.store.encrypt_blocks(ids, [1, 2])
+            with pytest.raises(ValueError, match="one key id per block"):
+                self.store.decrypt_blocks(ids, [1, 2])
+
+    def test_encrypt_skips_decryption_schedule(self, monkeypatch):
+        def fail(schedule):
+            raise AssertionError("decryption schedule built for an encrypt pass")
+
+        monkeypatch.setattr(aes_module, "decryption_schedule", fail)
+        ids = list(self.keys)[:4]
+        expected = [ReferenceAES(self.keys[i]).encrypt(5) for i in ids]
+        assert self.store.encrypt_blocks(ids, [5] * 4) == expected
+
+    def test_handle_engine(self):
+        handle = self.store["tenant-0"]
+        assert handle.engine().encrypt(7) == ReferenceAES(self.keys["tenant-0"]).encrypt(7)
+
+
+def test_handle_has_no_dict():
+    assert not hasattr(KeyHandle(KeyStore(), 0), "__dict__")
+
+
+def test_memory_per_key():
+    store = KeyStore()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(20000):
+        store.add(i, i)
+    per_key = (tracemalloc.get_traced_memory()[0] - before) / len(store)
+    tracemalloc.stop()
+    assert per_key < 2 * SCHEDULE_SIZE
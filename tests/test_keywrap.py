@@ -0,0 +1,67 @@
+import os
+import random
+
+import pytest
+from aes256.keywrap import KeyWrapError, unwrap, unwrap_many, wrap, wrap_many
+from .reference.aes import AES as ReferenceAES
+
+KEK = 0x000102030405060708090A0B0C0D0E0F
+
+
+def reference_wrap(kek, key, iv=0xA6A6A6A6A6A6A6A6):
+    """RFC 3394 section 2.2.1, one block at a time."""
+    aes = ReferenceAES(kek)
+    a, r = iv, [int.from_bytes(key[i : i + 8], "big") for i in range(0, len(key), 8)]
+    n = len(r)
+    for j in range(6):
+        for i in range(n):
+            b = aes.encrypt((a << 64) | r[i])
+            a, r[i] = (b >> 64) ^ (n * j + i + 1), b & (2**64 - 1)
+    return b"".join(x.to_bytes(8, "big") for x in [a, *r])
+
+
+def test_rfc3394_vector():
+    """RFC 3394 section 4.1: 128 bits of key data with a 128-bit KEK"""
+    wrapped = wrap(KEK, bytes.fromhex("00112233445566778899AABBCCDDEEFF"))
+    assert wrapped.hex() == "1fa68b0a8112b447aef34bd8fb5a7b829d3e862371d2cfe5"
+    assert unwrap(KEK, wrapped).hex() == "00112233445566778899aabbccddeeff"
+
+
+def test_bulk_mixed_lengths():
+    keys = [os.urandom(random.choice([16, 24, 32, 64])) for _ in range(40)]
+    wrapped = wrap_many(KEK, keys)
+    assert wrapped == [reference_wrap(KEK, key) for key in keys]
+    assert unwrap_many(KEK, wrapped) == keys
+
+
+def test_per_item_integrity_failures():
+    keys = [os.urandom(32) for _ in range(6)]
+    wrapped = wrap_many(KEK, keys)
+    wrapped[1] = bytes([wrapped[1][0] ^ 1]) + wrapped[1][1:]
+    wrapped[4] = wrapped[4][:-8]
+    wrapped[5] = wrapped[5][:12]
+    assert unwrap_many(KEK, wrapped) == [keys[0], None, keys[2], keys[3], None, None]
+    with pytest.raises(KeyWrapError):
+        unwrap(KEK ^ 1, wrap(KEK, keys[0]))
+
+
+@pytest.mark.parametrize("length", [1, 7, 8, 9, 20, 32])
+def test_rfc5649_roundtrip(length):
+    key = os.urandom(length)
+    wrapped = wrap(KEK, key, pad=True)
+    assert len(wrapped) == (16 if length <= 8 else 8 + 8 * -(-length // 8))
+    assert unwrap(KEK, wrapped, pad=True) == key
+
+
+def test_rfc5649_matches_rfc3394_process():
+    key = os.urandom(20)
+    aiv = 0xA65959A600000000 | len(key)
+    assert wrap(KEK, key, pad=True) == reference_wrap(KEK, key + bytes(4), aiv)
+
+
+def test_rfc5649_bulk_failures():
+    keys = [os.urandom(n) for n in (5, 16, 21, 3)]
+    wrapped = wrap_many(KEK, keys, pad=True)
+    wrapped[2] = wrapped[2][:-1] + bytes([wrapped[2][-1] ^ 0x80])
+    wrapped[3] = bytes(16)
+    assert unwrap_many(KEK, wrapped, pad=True) == [keys[0], keys[1], None, None]
@@ -0,0 +1,73 @@
+import random
+
+from aes256 import aes as aes_module
+from aes256 import metrics
+from aes256.aes import AES, expand_key, memory_per_block, peak_memory, reset_peak_memory
+from .reference.aes import AES as ReferenceAES
+
+KEY = 0x2B7E151628AED2A6ABF7158809CF4F3C
+
+
+def test_chunks_fit_budget():
+    aes = AES(KEY, memory_budget=64 * memory_per_block())
+    assert aes.chunk_blocks() == 64
+    blocks = [random.getrandbits(128) for _ in range(300)]
+    registry = metrics.Registry()
+    metrics.set_collector(registry)
+    try:
+        ciphertexts = aes.encrypt_blocks(blocks)
+        assert aes.decrypt_blocks(ciphertexts) == blocks
+    finally:
+        metrics.set_collector(metrics.registry)
+    reference = ReferenceAES(KEY)
+    assert ciphertexts == [reference.encrypt(b) for b in blocks]
+    assert registry.count("aes256_batch_blocks", direction="encrypt") == 5
+    assert registry.value("aes256_blocks_total", mode="ecb", direction="encrypt", key_bits=128) == 300
+
+
+def test_lane_keys_chunked_to_budget():
+    keys = [random.getrandbits(128) for _ in range(100)]
+    blocks = [random.getrandbits(128) for _ in keys]
+    aes = AES.from_schedule(b"".join(map(expand_key, keys)))
+    aes.memory_budget = 32 * memory_per_block(lane_keys=True)
+    assert aes.chunk_blocks() == 32
+    registry = metrics.Registry()
+    metrics.set_collector(registry)
+    try:
+        ciphertexts = aes.encrypt_blocks(blocks)
+        assert aes.decrypt_blocks(ciphertexts) == blocks
+        # odd lanes decrypt their ciphertext, even lanes encrypt their plaintext
+        mixed = [c if i % 2 else b for i, (b, c) in enumerate(zip(blocks, ciphertexts))]
+        assert aes.crypt_blocks(mixed, [i % 2 == 1 for i in range(100)]) == [
+            b if i % 2 else c for i, (b, c) in enumerate(zip(blocks, ciphertexts))
+        ]
+    finally:
+        metrics.set_collector(metrics.registry)
+    assert ciphertexts == [ReferenceAES(k).encrypt(b) for k, b in zip(keys, blocks)]
+    assert registry.count("aes256_batch_blocks", direction="encrypt") == 4
+    # only per-chunk keys were uploaded, never the whole batch's
+    assert aes.keys._encrypt is None and aes.keys._decrypt is None
+
+
+def test_chunk_is_power_of_two():
+    aes = AES(KEY, memory_budget=1000 * memory_per_block())
+    assert aes.chunk_blocks() == 512
+    aes.memory_budget = 1
+    assert aes.chunk_blocks() == 1
+
+
+def test_footprint_measured_from_kernels():
+    aes = AES(KEY)
+    for _ in range(2):
+        aes.encrypt_blocks([0] * 256)
+    lanes, nbytes = aes_module._footprint[("encrypt", aes.device, False)]
+    assert lanes >= 256
+    # at least the input and output states
+    assert 32 <= memory_per_block("encrypt") <= 256
+
+
+def test_peak_memory():
+    reset_peak_memory()
+    before = peak_memory()
+    AES(KEY).encrypt_blocks([0] * 1024)
+    assert peak_memory() >= before + 16 * 1024
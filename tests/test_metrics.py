@@ -0,0 +1,72 @@
+import pytest
+from aes256 import metrics
+from aes256.aes import AES
+from aes256.cmac import cmac_many
+from aes256.framing import decode, encode
+
+KEY = 0x2B7E151628AED2A6ABF7158809CF4F3C
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.Registry()
+    metrics.set_collector(registry)
+    yield registry
+    metrics.set_collector(metrics.registry)
+
+
+def test_block_counters(registry):
+    aes = AES(KEY)
+    aes.decrypt_blocks(aes.encrypt_blocks(list(range(5))))
+    for direction in ("encrypt", "decrypt"):
+        labels = {"mode": "ecb", "direction": direction, "key_bits": 128}
+        assert registry.value("aes256_blocks_total", **labels) == 5
+        assert registry.value("aes256_bytes_total", **labels) == 80
+        assert registry.count("aes256_batch_blocks", direction=direction) == 1
+        assert registry.count("aes256_seconds", op=direction) == 1
+    assert registry.value("aes256_key_expansions_total", key_bits=128) == 1
+    # one upload per direction, each on first use
+    assert registry.count("aes256_seconds", op="key_setup") == 2
+
+
+def test_modes_count_their_own_blocks(registry):
+    record = encode(KEY ^ 1, bytes(100), chunk_size=64)
+    decode(KEY ^ 1, record)
+    cmac_many(KEY ^ 2, [b"a" * 40, b""])
+    assert registry.value("aes256_blocks_total", mode="ctr", direction="encrypt", key_bits=128) == 14
+    assert registry.value("aes256_blocks_total", mode="cmac", direction="encrypt", key_bits=128) == 1 + 4  # subkey derivation, then 2 + 1 + 1
+    assert metrics.current_mode() == "ecb"
+
+
+def test_prometheus_text(registry):
+    AES(KEY).encrypt_blocks([1, 2, 3])
+    text = registry.prometheus()
+    assert "# TYPE aes256_blocks_total counter" in text
+    assert 'aes256_blocks_total{direction="encrypt",key_bits="128",mode="ecb"} 3' in text
+    assert "# TYPE aes256_batch_blocks histogram" in text
+    assert 'aes256_batch_blocks_bucket{direction="encrypt",le="4"} 1' in text
+    assert 'aes256_batch_blocks_bucket{direction="encrypt",le="+Inf"} 1' in text
+    assert 'aes256_batch_blocks_sum{direction="encrypt"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_pluggable_collector():
+    class Events(metrics.Collector):
+        def __init__(self):
+            self.events = []
+
+        def inc(self, name, value, labels):
+            self.events.append((name, value, dict(labels)))
+
+    events = Events()
+    metrics.set_collector(events)
+    try:
+        AES(KEY).encrypt_blocks([1, 2])
+    finally:
+        metrics.set_collector(None)
+    assert ("aes256_blocks_total", 2, {"mode": "ecb", "direction": "encrypt", "key_bits": 128}) in events.events
+
+    seen = len(events.events)
+    AES(KEY).encrypt_blocks([1])
+    metrics.set_collector(metrics.registry)
+    assert len(events.events) == seen
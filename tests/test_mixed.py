@@ -0,0 +1,46 @@
+import random
+
+import pytest
+from aes256.aes import AES, expand_key
+from aes256.trace import diff_traces
+from .reference.aes import AES as ReferenceAES
+
+KEY = 0x2B7E151628AED2A6ABF7158809CF4F3C
+
+
+def expected(reference, blocks, decrypt):
+    return [reference.decrypt(b) if d else reference.encrypt(b) for b, d in zip(blocks, decrypt)]
+
+
+def test_mixed_batch():
+    blocks = [random.getrandbits(128) for _ in range(40)]
+    decrypt = [random.random() < 0.5 for _ in blocks]
+    aes = AES(KEY)
+    out = aes.crypt_blocks(blocks, decrypt)
+    assert out == expected(ReferenceAES(KEY), blocks, decrypt)
+    # flipping every direction undoes the pass
+    assert aes.crypt_blocks(out, [not d for d in decrypt]) == blocks
+
+
+def test_mixed_per_lane_keys():
+    keys = [random.getrandbits(128) for _ in range(5)]
+    blocks = [random.getrandbits(128) for _ in keys]
+    decrypt = [True, False, False, True, True]
+    out = AES.from_schedule(b"".join(map(expand_key, keys))).crypt_blocks(blocks, decrypt)
+    assert out == [expected(ReferenceAES(k), [b], [d])[0] for k, b, d in zip(keys, blocks, decrypt)]
+
+
+@pytest.mark.parametrize("lane", [0, 1])
+def test_mixed_trace_matches_single_direction(lane):
+    blocks = [0x3243F6A8885A308D313198A2E0370734, 0x3925841D02DC09FBDC118597196A0B32]
+    decrypt = [False, True]
+    aes = AES(KEY)
+    mixed, single = [], []
+    aes.crypt_blocks(blocks, decrypt, trace=mixed, lane=lane)
+    (aes.decrypt_blocks if decrypt[lane] else aes.encrypt_blocks)(blocks, trace=single, lane=lane)
+    assert diff_traces(single, mixed) is None
+
+
+def test_mask_length():
+    with pytest.raises(ValueError, match="one direction per block"):
+        AES(KEY).crypt_blocks([1, 2], [True])
@@ -0,0 +1,40 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from aes256.aes import AES, RoundKeys, expand_key
+from aes256.parallel import map_encrypt, map_decrypt
+from .reference.aes import AES as ReferenceAES
+
+
+class TestThreadPool:
+    def setup_method(self):
+        self.key = random.getrandbits(128)
+        self.blocks = [random.getrandbits(128) for _ in range(300)]
+        self.aes = AES(self.key)
+
+    def test_map_encrypt_matches_reference(self):
+        ref = ReferenceAES(self.key)
+        out = map_encrypt(self.aes, self.blocks, batch_size=64, workers=4)
+        assert out == [ref.encrypt(block) for block in self.blocks]
+
+    def test_map_decrypt_roundtrip(self):
+        with ThreadPoolExecutor(3) as pool:
+            ciphertexts = map_encrypt(self.aes, self.blocks, batch_size=32, executor=pool)
+            assert map_decrypt(self.aes, ciphertexts, batch_size=32, executor=pool) == self.blocks
+
+    def test_shared_round_keys(self):
+        keys = RoundKeys(expand_key(self.key))
+        engines = [AES.from_round_keys(keys) for _ in range(4)]
+        with ThreadPoolExecutor(4) as pool:
+            outs = list(pool.map(lambda aes: aes.encrypt_blocks(self.blocks[:16]), engines))
+        assert all(out == outs[0] for out in outs)
+        assert outs[0] == self.aes.encrypt_blocks(self.blocks[:16])
+
+    def test_round_keys_are_immutable(self):
+        with pytest.raises(AttributeError):
+            self.aes.keys.lanes = 2
+        old = self.aes.keys
+        self.aes.change_key(self.key ^ 1)
+        assert self.aes.keys is not old
+        assert AES.from_round_keys(old).encrypt_blocks(self.blocks[:4]) == AES(self.key).encrypt_blocks(self.blocks[:4])
@@ -0,0 +1,129 @@
+import io
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from aes256 import reencrypt as reencrypt_module
+from aes256.aes import AES
+from aes256.reencrypt import reencrypt
+from .reference.aes import AES as ReferenceAES
+
+OLD, NEW = random.getrandbits(128), random.getrandbits(128)
+NONCE = bytes(range(12))
+
+
+def ecb(key: int, data: bytes) -> bytes:
+    aes = ReferenceAES(key)
+    return b"".join(aes.encrypt(int.from_bytes(data[i : i + 16], "big")).to_bytes(16, "big") for i in range(0, len(data), 16))
+
+
+def ctr(key: int, data: bytes) -> bytes:
+    aes = ReferenceAES(key)
+    prefix = int.from_bytes(NONCE, "big") << 32
+    stream = b"".join(aes.encrypt(prefix | i).to_bytes(16, "big") for i in range(-(-len(data) // 16)))
+    return bytes(a ^ b for a, b in zip(data, stream))
+
+
+class FailingSink(io.BytesIO):
+    """Fails after a given number of writes, like a process killed mid-run."""
+
+    def __init__(self, writes: int):
+        super().__init__()
+        self.writes = writes
+
+    def write(self, data):
+        if self.writes == 0:
+            raise RuntimeError("interrupted")
+        self.writes -= 1
+        return super().write(data)
+
+
+@pytest.mark.parametrize("mode,encrypt,size", [("ecb", ecb, 160), ("ctr", ctr, 157)])
+def test_reencrypt(mode, encrypt, size):
+    plaintext = random.randbytes(size)
+    sink = io.BytesIO()
+    n = reencrypt(OLD, NEW, io.BytesIO(encrypt(OLD, plaintext)), sink, mode=mode, nonce=NONCE, chunk_size=48)
+    assert n == size
+    assert sink.getvalue() == encrypt(NEW, plaintext)
+
+
+def test_sharded():
+    plaintext = random.randbytes(1000)
+    sink = io.BytesIO()
+    with ThreadPoolExecutor(4) as pool:
+        reencrypt(OLD, NEW, io.BytesIO(ctr(OLD, plaintext)), sink, mode="ctr", nonce=NONCE, chunk_size=64, executor=pool)
+    assert sink.getvalue() == ctr(NEW, plaintext)
+
+
+def test_shared_round_keys():
+    aes = AES(OLD)
+    for target in (aes, AES.from_round_keys(aes.keys)):
+        assert aes.keystream_delta([1, 2], target) == [0, 0]
+        assert aes.reencrypt_blocks([1, 2], target) == [1, 2]
+
+
+def test_process_pool_rejected():
+    with ProcessPoolExecutor(1) as pool, pytest.raises(TypeError, match="ThreadPoolExecutor"):
+        reencrypt(OLD, NEW, io.BytesIO(bytes(32)), io.BytesIO(), executor=pool)
+
+
+def test_resume(tmp_path):
+    plaintext = random.randbytes(320)
+    source = io.BytesIO(ecb(OLD, plaintext))
+    checkpoint = tmp_path / "rotate.json"
+    sink = FailingSink(writes=3)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        reencrypt(OLD, NEW, source, sink, chunk_size=32, checkpoint=checkpoint)
+    assert json.loads(checkpoint.read_text())["offset"] == 96
+
+    sink.writes = -1
+    assert reencrypt(OLD, NEW, source, sink, chunk_size=32, checkpoint=checkpoint) == 320
+    assert sink.getvalue() == ecb(NEW, plaintext)
+    assert not checkpoint.exists()
+
+
+def test_resume_settings_must_match(tmp_path):
+    checkpoint = tmp_path / "rotate.json"
+    checkpoint.write_text(json.dumps({"mode": "ecb", "chunk_size": 32, "nonce": None, "offset": 32}))
+    with pytest.raises(ValueError, match="different settings"):
+        reencrypt(OLD, NEW, io.BytesIO(), io.BytesIO(), chunk_size=64, checkpoint=checkpoint)
+
+
+def interrupted(tmp_path, source):
+    checkpoint = tmp_path / "rotate.json"
+    with pytest.raises(RuntimeError, match="interrupted"):
+        reencrypt(OLD, NEW, source, FailingSink(writes=2), chunk_size=32, checkpoint=checkpoint)
+    return checkpoint
+
+
+def test_resume_keys_must_match(tmp_path):
+    ciphertext = ecb(OLD, random.randbytes(128))
+    checkpoint = interrupted(tmp_path, io.BytesIO(ciphertext))
+    with pytest.raises(ValueError, match="different keys"):
+        reencrypt(OLD, NEW ^ 1, io.BytesIO(ciphertext), io.BytesIO(), chunk_size=32, checkpoint=checkpoint)
+
+
+def test_resume_source_must_match(tmp_path):
+    ciphertext = ecb(OLD, random.randbytes(128))
+    checkpoint = interrupted(tmp_path, io.BytesIO(ciphertext))
+    other = bytearray(ciphertext)
+    other[40] ^= 1
+    with pytest.raises(ValueError, match="source does not match"):
+        reencrypt(OLD, NEW, io.BytesIO(bytes(other)), io.BytesIO(), chunk_size=32, checkpoint=checkpoint)
+
+
+def test_ctr_counter_overflow(monkeypatch):
+    monkeypatch.setattr(reencrypt_module, "MAX_CTR_BLOCKS", 4)
+    assert reencrypt(OLD, NEW, io.BytesIO(bytes(64)), io.BytesIO(), mode="ctr", nonce=NONCE) == 64
+    with pytest.raises(ValueError, match="32-bit block counter"):
+        reencrypt(OLD, NEW, io.BytesIO(bytes(65)), io.BytesIO(), mode="ctr", nonce=NONCE)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError, match="mode"):
+        reencrypt(OLD, NEW, io.BytesIO(), io.BytesIO(), mode="cbc")
+    with pytest.raises(ValueError, match="nonce"):
+        reencrypt(OLD, NEW, io.BytesIO(), io.BytesIO(), mode="ctr")
+    with pytest.raises(ValueError, match="multiple of 16 bytes"):
+        reencrypt(OLD, NEW, io.BytesIO(bytes(20)), io.BytesIO())
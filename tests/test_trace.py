@@ -0,0 +1,66 @@
+import pytest
+from aes256.aes import AES
+from aes256.trace import diff_traces, format_trace
+from .engines import ENGINES, SLOW_ENGINES
+
+# FIPS-197 Appendix C.1
+KEY = 0x000102030405060708090A0B0C0D0E0F
+PLAINTEXT = 0x00112233445566778899AABBCCDDEEFF
+CIPHERTEXT = 0x69C4E0D86A7B0430D8CDB78070B4C55A
+
+
+def test_encrypt_trace_matches_appendix():
+    trace = []
+    assert AES(KEY).encrypt(PLAINTEXT, trace) == CIPHERTEXT
+    lines = format_trace(trace).splitlines()
+    assert lines[0] == "round[ 0].input   00112233445566778899aabbccddeeff"
+    assert lines[2] == "round[ 1].start   00102030405060708090a0b0c0d0e0f0"
+    assert lines[3] == "round[ 1].s_box   63cab7040953d051cd60e0e7ba70e18c"
+    assert lines[4] == "round[ 1].s_row   6353e08c0960e104cd70b751bacad0e7"
+    assert lines[5] == "round[ 1].m_col   5f72641557f5bc92f7be3b291db9f91a"
+    assert lines[6] == "round[ 1].k_sch   d6aa74fdd2af72fadaa678f1d6ab76fe"
+    assert lines[-1] == "round[10].output  69c4e0d86a7b0430d8cdb78070b4c55a"
+
+
+def test_decrypt_trace_matches_appendix():
+    """Decryption runs the equivalent inverse cipher, so it traces that appendix section."""
+    trace = []
+    assert AES(KEY).decrypt(CIPHERTEXT, trace) == PLAINTEXT
+    lines = format_trace(trace).splitlines()
+    assert lines[2] == "round[ 1].istart  7ad5fda789ef4e272bca100b3d9ff59f"
+    assert lines[3] == "round[ 1].is_box  bdb52189f261b63d0b107c9e8b6e776e"
+    assert lines[4] == "round[ 1].is_row  bd6e7c3df2b5779e0b61216e8b10b689"
+    assert lines[5] == "round[ 1].im_col  4773b91ff72f354361cb018ea1e6cf2c"
+    assert lines[6] == "round[ 1].ik_sch  13aa29be9c8faff6f770f58000f7bf03"
+    assert lines[-1] == "round[10].ioutput 00112233445566778899aabbccddeeff"
+
+
+@pytest.mark.parametrize("direction", ["encrypt", "decrypt"])
+def test_engines_trace_identically(direction):
+    keys = [0, KEY, 2**128 - 1]
+    blocks = [1, PLAINTEXT, CIPHERTEXT]
+    traces = []
+    for make in [*ENGINES.values(), *SLOW_ENGINES.values()]:
+        traces.append([])
+        getattr(make(keys), f"{direction}_blocks")(blocks, trace=traces[-1], lane=1)
+    assert len(traces[0]) == 1 + 1 + 9 * 5 + 5
+    for trace in traces[1:]:
+        assert diff_traces(traces[0], trace) is None
+
+
+def test_batched_trace_follows_lane():
+    aes = AES(KEY)
+    alone, batched = [], []
+    aes.encrypt(PLAINTEXT, alone)
+    out = aes.encrypt_blocks([0, 1, PLAINTEXT, 3], batched, lane=2)
+    assert batched == alone
+    assert out == aes.encrypt_blocks([0, 1, PLAINTEXT, 3])
+
+
+@pytest.mark.parametrize("lane", [-1, 3, 8])
+@pytest.mark.parametrize("direction", ["encrypt", "decrypt", "crypt"])
+def test_trace_lane_out_of_range(direction, lane):
+    aes = AES(KEY)
+    args = ([1, 2, 3], [True, False, True]) if direction == "crypt" else ([1, 2, 3],)
+    with pytest.raises(ValueError, match=f"lane {lane} out of range for 3 blocks"):
+        getattr(aes, f"{direction}_blocks")(*args, trace=[], lane=lane)